@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import xlsxwriter
+
+import Extract
+
+# ====================================================================================
+# --- BENCHMARK CONFIGURATION ---
+# ====================================================================================
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]  # Report 61 rows across all models
+DEFAULT_MODELS = 8
+DEFAULT_OVERLAP = 0.8  # Share of the Report 61 keys already in PFEP (the rest is phase-in)
+DEFAULT_SEED = 42
+REPORT_29_ROW_RATIO = 0.25  # Report 29 rows per Report 61 row
+PART_NUMBER_RATIO = 0.3  # Distinct part numbers per Report 61 row
+DESCRIPTION_VOCABULARY = 5_000  # Distinct part descriptions, shared by Report 32 and PFEP
+WEIGHT_ONE_RATIO = 0.3  # Share of Report 32 parts with the placeholder weight of 1
+RESULTS_FILE = "benchmark_results.json"
+
+REPORT_61_COLUMNS = ['nidElementParent', 'vcCodeParent', 'nidElementTypeParent', 'vcDescriptionParent',
+                     'vcCode', 'nidElementType', 'nLevel', 'nidSupplyType', 'vcDescription', 'fQty']
+PFEP_EXTRA_COLUMNS = ['Item', 'Fornecedor']
+
+# ====================================================================================
+# --- SYNTHETIC DATA GENERATOR ---
+# ====================================================================================
+
+def _check_digit(numbers):
+    """Appends a mod-10 check digit, as in the ElementNode column of Report 32 (stripped by the pipeline)."""
+    return [f"{n}{sum(map(int, n)) % 10}" for n in numbers]
+
+
+def _write_csv(df, path):
+    df.to_csv(path, index=False, encoding='utf-16')
+
+
+def make_part_numbers(count):
+    return np.array([str(50_000_000 + i) for i in range(count)], dtype=object)
+
+
+def report_32_rows(rng, part_numbers):
+    """Report 32: one row per part number, about WEIGHT_ONE_RATIO of them with weight 1."""
+    weights = np.round(rng.uniform(0.01, 25.0, len(part_numbers)), 3)
+    weights[rng.random(len(part_numbers)) < WEIGHT_ONE_RATIO] = 1.0
+    return pd.DataFrame({
+        'ElementNode': _check_digit([pn.zfill(10) for pn in part_numbers]),
+        'DescriptionElementNode': [f"PECA {i % DESCRIPTION_VOCABULARY}" for i in range(len(part_numbers))],
+        'Weight': weights,
+    })
+
+
+def report_rows(rng, count, part_numbers, model_code):
+    """Report 61/29 style BOM rows; roughly two thirds pass the merge filter."""
+    parents = rng.integers(0, len(part_numbers), count)
+    children = rng.integers(0, len(part_numbers), count)
+    return pd.DataFrame({
+        'nidElementParent': rng.integers(1, 10_000_000, count),
+        'vcCodeParent': part_numbers[parents],
+        'nidElementTypeParent': rng.choice([1, 2, 3], count),
+        'vcDescriptionParent': [f"CONJ {model_code} {p % 997}" for p in parents],
+        'vcCode': part_numbers[children],
+        'nidElementType': rng.choice([1, 2], count, p=[0.15, 0.85]),
+        'nLevel': rng.integers(1, 6, count),
+        'nidSupplyType': rng.choice([1, 2, 3], count, p=[0.6, 0.3, 0.1]),
+        'vcDescription': [f"PECA {c % DESCRIPTION_VOCABULARY}" for c in children],
+        'fQty': rng.choice([1.0, 2.0, 4.0, 0.5], count),
+    }, columns=REPORT_61_COLUMNS)
+
+
+def _passes_61_filter(df):
+    return (df['nidElementType'] == 2) & df['nLevel'].isin([1, 2, 3]) & df['nidSupplyType'].isin([1, 2])
+
+
+def generate_dataset(base_path, rows, models=DEFAULT_MODELS, overlap=DEFAULT_OVERLAP, seed=DEFAULT_SEED):
+    """
+    Writes a synthetic run into base_path: Modelos.json, the Report 61/29 model CSVs,
+    'Relatorio 32.csv' (all UTF-16, as downloaded from the portal) and 'PFEP - Dados.xlsx'
+    with its header on row 10. Returns a summary of what was generated.
+    """
+    rng = np.random.default_rng(seed)
+    reports_path = os.path.join(base_path, Extract.REPORTS_FOLDER_NAME)
+    folder_61 = os.path.join(reports_path, Extract.MODELS_SUBFOLDER_NAME_61)
+    folder_29 = os.path.join(reports_path, Extract.MODELS_SUBFOLDER_NAME_29)
+    for folder in (folder_61, folder_29):
+        os.makedirs(folder, exist_ok=True)
+
+    models_data = {f"Modelo{i + 1}": f"{2800 + 10 * i} - 0 (**)" for i in range(models)}
+    with open(os.path.join(base_path, Extract.JSON_MODELS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(models_data, f, indent=4)
+
+    part_count = max(10, int(rows * PART_NUMBER_RATIO))
+    part_numbers = make_part_numbers(part_count)
+
+    keys = []
+    rows_29 = int(rows * REPORT_29_ROW_RATIO)
+    for i, (model_name, model_text) in enumerate(models_data.items()):
+        model_code = model_text.split()[0]
+        model_rows = rows // models + (1 if i < rows % models else 0)
+        df = report_rows(rng, model_rows, part_numbers, model_code)
+        _write_csv(df, os.path.join(folder_61, f"{model_name}.csv"))
+        kept = df.loc[_passes_61_filter(df), 'vcCode'].drop_duplicates()
+        keys.append(pd.DataFrame({'Part Number': kept.values, 'Modelo': model_code}))
+        model_rows_29 = rows_29 // models + (1 if i < rows_29 % models else 0)
+        _write_csv(report_rows(rng, model_rows_29, part_numbers, model_code), os.path.join(folder_29, f"{model_name}.csv"))
+
+    _write_csv(report_32_rows(rng, part_numbers), os.path.join(reports_path, "Relatorio 32.csv"))
+
+    # PFEP: `overlap` of the Report 61 keys, plus as many keys again that left the BOM (phase-out)
+    todos_keys = pd.concat(keys, ignore_index=True)
+    in_pfep = todos_keys.sample(frac=overlap, random_state=seed)
+    phase_out_count = len(todos_keys) - len(in_pfep)
+    phase_out = pd.DataFrame({
+        'Part Number': [str(90_000_000 + i) for i in range(phase_out_count)],
+        'Modelo': rng.choice([text.split()[0] for text in models_data.values()], phase_out_count),
+    })
+    pfep_df = pd.concat([in_pfep, phase_out], ignore_index=True)
+    pfep_numbers = pfep_df['Part Number'].astype(int)
+    pfep_df['Descricao PN'] = [f"PECA {n % DESCRIPTION_VOCABULARY}" for n in pfep_numbers]
+    pfep_df['Peso unitario PN (kg)'] = np.round(rng.uniform(0.01, 25.0, len(pfep_df)), 3).astype(str)
+    pfep_df['Item'] = np.arange(1, len(pfep_df) + 1)
+    pfep_df['Fornecedor'] = [f"FORNECEDOR {n % 300}" for n in pfep_numbers]
+    _write_pfep(pfep_df[PFEP_EXTRA_COLUMNS[:1] + Extract.PFEP_COLUMNS + PFEP_EXTRA_COLUMNS[1:]],
+                os.path.join(reports_path, "PFEP - Dados.xlsx"))
+
+    return {
+        "report_61_rows": rows,
+        "report_29_rows": rows_29,
+        "part_numbers": part_count,
+        "report_61_keys": len(todos_keys),
+        "pfep_rows": len(pfep_df),
+    }
+
+
+def _write_pfep(df, path):
+    """PFEP workbook as maintained by hand: a title block, then the table header on row 10."""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet("PFEP")
+    worksheet.write(0, 0, "PFEP - Dados (sintético)")
+    header_row = Extract.PFEP_HEADER_ROW
+    worksheet.write_row(header_row, 0, list(df.columns))
+    for offset, row in enumerate(df.itertuples(index=False), start=1):
+        worksheet.write_row(header_row + offset, 0, row)
+    workbook.close()
+
+# ====================================================================================
+# --- BENCHMARK RUNNER ---
+# ====================================================================================
+
+STAGES = [
+    ("merge_models_61", lambda reports_path, base_path: Extract.merge_models_61(reports_path, base_path)),
+    ("process_merged_report_61", lambda reports_path, base_path: Extract.process_merged_report_61(reports_path)),
+    ("merge_models_29", lambda reports_path, base_path: Extract.merge_models_29(reports_path, base_path)),
+    ("process_merged_report_29", lambda reports_path, base_path: Extract.process_merged_report_29(reports_path)),
+    ("process_other_reports", lambda reports_path, base_path: Extract.process_other_reports(reports_path)),
+    ("Create_Compare_Table", lambda reports_path, base_path: Extract.Create_Compare_Table(reports_path, {})),
+]
+
+
+class _StageMeter:
+    """
+    Times a stage and records the peak Python heap (tracemalloc) while it runs.
+    Nested measurements (update_weights inside Create_Compare_Table) keep the outer peak intact.
+    Memory held by worker processes and by Arrow's own allocator is not traced.
+    """
+    def __init__(self):
+        self.results = {}
+        self._outer_peak = 0
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        nested = tracemalloc.is_tracing()
+        if nested:
+            start_current, peak_so_far = tracemalloc.get_traced_memory()
+            self._outer_peak = max(self._outer_peak, peak_so_far)
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            start_current = 0
+            self._outer_peak = 0
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1]
+            if nested:
+                self._outer_peak = max(self._outer_peak, peak)
+                peak -= start_current
+            else:
+                peak = max(peak, self._outer_peak)
+                tracemalloc.stop()
+            self.results[name] = {"seconds": round(seconds, 3), "peak_mb": round(peak / 2**20, 1)}
+
+
+def _print_result(name, result):
+    print(f"  {name:<26} {result['seconds']:>9.2f}s {result['peak_mb']:>9.1f} MB")
+
+
+def run_size(rows, args):
+    work_path = tempfile.mkdtemp(prefix=f"pfep_bench_{rows}_", dir=args.workdir)
+    reports_path = os.path.join(work_path, Extract.REPORTS_FOLDER_NAME)
+    meter = _StageMeter()
+    original_update_weights = Extract.update_weights
+
+    def measured_update_weights(*a, **kw):
+        with meter.measure("update_weights"):
+            return original_update_weights(*a, **kw)
+
+    try:
+        print(f"\n--- 🧪 {rows:,} rows: generating data in {work_path} ---")
+        start_time = time.perf_counter()
+        dataset = generate_dataset(work_path, rows, models=args.models, overlap=args.overlap, seed=args.seed)
+        print(f"Generated in {time.perf_counter() - start_time:.1f}s: {dataset}")
+
+        Extract.update_weights = measured_update_weights
+        arrow_pool = pa.default_memory_pool()
+        for name, stage in STAGES:
+            output = sys.stdout if args.verbose else open(os.devnull, 'w', encoding='utf-8')
+            try:
+                with contextlib.redirect_stdout(output), meter.measure(name):
+                    stage(reports_path, work_path)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+            _print_result(name, meter.results[name])
+        if "update_weights" in meter.results:
+            _print_result("  update_weights", meter.results["update_weights"])
+        return {
+            "rows": rows,
+            "dataset": dataset,
+            "stages": meter.results,
+            "arrow_peak_mb": round(arrow_pool.max_memory() / 2**20, 1),
+        }
+    finally:
+        Extract.update_weights = original_update_weights
+        if not args.keep:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+
+def compare_results(baseline, current):
+    """Prints stage timings and peaks of two result files side by side, per row count."""
+    baseline_runs = {run["rows"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        base_run = baseline_runs.get(run["rows"])
+        if base_run is None:
+            continue
+        print(f"\n--- 📊 {run['rows']:,} rows: baseline vs current ---")
+        for name, result in run["stages"].items():
+            base = base_run["stages"].get(name)
+            if base is None:
+                continue
+            ratio = result["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+            print(f"  {name:<26} {base['seconds']:>9.2f}s -> {result['seconds']:>9.2f}s ({ratio:.2f}x)"
+                  f"   {base['peak_mb']:>8.1f} -> {result['peak_mb']:>8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the post-processing stages on synthetic report data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="Report 61 row counts to run")
+    parser.add_argument("--models", type=int, default=DEFAULT_MODELS)
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP, help="Share of Report 61 keys present in PFEP")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--merge-workers", type=int, default=Extract.MERGE_WORKERS)
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON file the results are written to")
+    parser.add_argument("--compare", help="Earlier results file to compare this run against")
+    parser.add_argument("--workdir", help="Where the synthetic data is generated (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated data after the run")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    Extract.EPER_ENABLED = False
+    Extract.MERGE_WORKERS = args.merge_workers
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "settings": {
+            "models": args.models,
+            "overlap": args.overlap,
+            "seed": args.seed,
+            "merge_workers": Extract.MERGE_WORKERS,
+            "merge_chunk_rows": Extract.MERGE_CHUNK_ROWS,
+        },
+        "runs": [run_size(rows, args) for rows in args.rows],
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,34 +3,84 @@ import os
 import sys
 import json
 import glob
-import pandas as pd
 import shutil
 import threading
 import queue
-import tkinter as tk
-from tkinter import scrolledtext, font
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from datetime import date
+import select
+import ctypes
+import ctypes.util
+import importlib.util
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 Chrome_driver_path = None  # global declaration
 
 
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+import multiprocessing
 import re
-from playwright import sync_api
-import json
-import time
-import pandas as pd
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import asyncio
+import argparse
+import statistics
 import subprocess
+import hashlib
+import sqlite3
 from pathlib import Path
+from contextlib import contextmanager
+import contextvars
+import logging
+import logging.handlers
+import functools
+import uuid
+
+
+class _MissingModule:
+    """Stands in for a module that is not installed; raises only when it is actually used."""
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        raise ModuleNotFoundError(f"No module named '{self._name}'", name=self._name)
+
+
+def lazy_import(name):
+    """
+    Returns a top-level module that is only really imported on first attribute access,
+    so headless runs and post-processing-only stages do not pay for GUI/browser/data imports.
+    A module that is not installed (e.g. tkinter on a server without Tk) only fails when used.
+    Submodules (selenium.*, playwright.*, pyarrow.parquet, tkinter.*) are imported inside
+    the functions that use them instead.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return _MissingModule(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_now(*modules):
+    """
+    Finishes loading lazily imported modules on the calling thread. LazyLoader is not
+    thread-safe before Python 3.12, so this runs before pipeline threads and merge
+    processes can touch the same module at the same time.
+    """
+    for module in modules:
+        module.__dict__
+
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+tk = lazy_import("tkinter")
+urllib3 = lazy_import("urllib3")
+xlsxwriter = lazy_import("xlsxwriter")
 
 # ====================================================================================
 # --- GUI IMPLEMENTATION ---
@@ -50,9 +100,27 @@ class QueueHandler(object):
     def flush(self):
         pass
 
+def create_file_log(path):
+    """Logger writing the full GUI log to a rotating file, text as printed (no extra newlines)."""
+    file_log = logging.getLogger("pfep.gui")
+    file_log.setLevel(logging.INFO)
+    file_log.propagate = False
+    if not file_log.handlers:
+        try:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        except OSError as e:
+            print(f"WARNING: Could not open log file {path}. {e}")
+            handler = logging.NullHandler()
+        handler.terminator = ""
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        file_log.addHandler(handler)
+    return file_log
+
+
 class App:
     def __init__(self, root):
         """Initializes the Tkinter application."""
+        from tkinter import scrolledtext, font
         self.root = root
         self.root.title("MONITOR DE PROCESSOS (PFEP)")
         self.root.geometry("700x600")
@@ -80,26 +148,39 @@ class App:
         # --- Setup queue for logging ---
         self.log_queue = queue.Queue()
         self.queue_handler = QueueHandler(self.log_queue)
+        self.file_log = create_file_log(os.path.join(get_base_path(), LOG_FILE))
 
         # Start periodic check of the queue
-        self.root.after(100, self.process_queue)
+        self.root.after(LOG_POLL_MS, self.process_queue)
 
     def log_message(self, message):
-        """Inserts a message into the log widget."""
+        """Inserts a message into the log widget, keeping only the last LOG_MAX_LINES lines."""
         self.log_widget.config(state='normal')
         self.log_widget.insert(tk.END, message)
+        line_count = int(self.log_widget.index('end-1c').split('.')[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_widget.delete('1.0', f"{line_count - LOG_MAX_LINES + 1}.0")
         self.log_widget.config(state='disabled')
         self.log_widget.see(tk.END)
 
     def process_queue(self):
-        """Processes messages from the log queue."""
+        """
+        Processes messages from the log queue: everything written since the last tick
+        (up to LOG_MAX_BATCH_MESSAGES fragments) goes to the log file and into the widget in one insert.
+        """
+        fragments = []
         try:
-            while True:
-                message = self.log_queue.get_nowait()
-                self.log_message(message)
+            while len(fragments) < LOG_MAX_BATCH_MESSAGES:
+                fragments.append(self.log_queue.get_nowait())
         except queue.Empty:
             pass
-        self.root.after(100, self.process_queue)
+        if fragments:
+            batch = "".join(fragments)
+            self.file_log.info(batch)
+            if batch.count("\n") > LOG_MAX_LINES:
+                batch = "\n".join(batch.split("\n")[-LOG_MAX_LINES:])
+            self.log_message(batch)
+        self.root.after(LOG_POLL_MS, self.process_queue)
 
     def start_process_thread(self):
         """Starts the main RPA logic in a separate thread."""
@@ -119,12 +200,12 @@ class App:
         if self.process_thread.is_alive():
             self.root.after(1000, self.check_thread)
         else:
-            self.log_message("\n\n--- 🎉 GUI: Background process has completed. ---")
             sys.stdout = sys.__stdout__ # Restore stdout
+            self.log_queue.put("\n\n--- 🎉 GUI: Background process has completed. ---\n")
             self.start_button.config(state='normal', text="🚀 Start Process Again")
 
 # ====================================================================================
-# --- ORIGINAL SCRIPT LOGIC (UNCHANGED) ---
+# --- REPORT PIPELINE ---
 # ====================================================================================
 
 # --- Global Configuration ---
@@ -133,6 +214,7 @@ DRIVER_NAME = "msedgedriver.exe"
 REPORTS_FOLDER_NAME = "Reports"
 MODELS_SUBFOLDER_NAME_61 = "Modelos_61"
 MODELS_SUBFOLDER_NAME_29 = "Modelos_29"
+PORTAL_SCHEME = "https"  # "http" only for the local stand-in portal (Fake_Portal.py)
 BASE_URL = "rtmcarroceria.fiat.com.br/bom/Functions/AllactivitiesList.aspx?idPlant=19"
 BASE_URL_RELATORIO_61 = "rtmcarroceria.fiat.com.br/bom/Elab/elab61.aspx?idPlant=19&idElaborationType=61"
 BASE_URL_RELATORIO_29 = "rtmcarroceria.fiat.com.br/bom/Elab/elab29.aspx?idPlant=19&idElaborationType=29"
@@ -145,194 +227,1886 @@ REPORTS_TO_DOWNLOAD = [
     ("61", "Relatorio 61"),
 ]
 
-def wait_and_get_downloaded_file(download_path, timeout):
-    seconds = 0
-    while seconds < timeout:
-        files = os.listdir(download_path)
-        completed_files = [f for f in files if not f.endswith(('.crdownload', '.tmp'))]
-        if completed_files:
-            return os.path.join(download_path, completed_files[0])
-        time.sleep(1)
-        seconds += 1
+# --- E-PER Weight Lookup Configuration ---
+EPER_LOGIN_URL = "https://eper-ltm.parts.fiat.com/navi?EU=1&eperLogin=0&sso=false&COUNTRY=076&RMODE=DEFAULT&SEARCH_TYPE=codpart&KEY=HOME"
+EPER_CONCURRENCY = 4  # Pages searching at the same time (1 = original sequential scraper)
+EPER_QUEUE_SIZE = 2 * EPER_CONCURRENCY
+EPER_PN_TIMEOUT_SECONDS = 60
+EPER_DETAILS_WAIT_SECONDS = 5  # How long to wait for the part details table after the search
+# True once the previous search's details are gone or the details table shows the searched PN
+EPER_NEW_DETAILS_JS = """([previous, pn]) => !previous.isConnected ||
+    Array.from(document.querySelectorAll('td.part_details_value')).some(td => td.innerText.trim() === pn)"""
+EPER_ENABLED = True  # False skips E-PER scraping entirely (e.g. benchmarks on synthetic data)
+
+# --- Part Weight Cache Configuration ---
+WEIGHT_CACHE_FILE = "weight_cache.sqlite"  # Saved inside the Reports folder
+WEIGHT_CACHE_TTL_DAYS = 30
+WEIGHT_CACHE_NOT_FOUND_TTL_DAYS = 3  # Retry PNs E-PER did not have sooner than known weights
+WEIGHT_SOURCE_EPER = "E-PER"
+WEIGHT_SOURCE_PFEP_PN = "PFEP (PN)"
+WEIGHT_SOURCE_PFEP_DESC = "PFEP (Descrição)"
+WEIGHT_SOURCE_REPORT_32 = "Relatório 32"
+WEIGHT_SOURCE_DEFAULT = "Sem peso"  # Weight still 1 (or missing) after every lookup
+WEIGHT_SOURCE_SNAPSHOT_SUFFIX = " (snapshot)"  # Appended to the source of weights reused from the last comparison
+
+# --- Report 29/61 Elaboration Configuration ---
+ELABORATION_REPORTS = {
+    "29": {"url": BASE_URL_RELATORIO_29, "subfolder": MODELS_SUBFOLDER_NAME_29},
+    "61": {"url": BASE_URL_RELATORIO_61, "subfolder": MODELS_SUBFOLDER_NAME_61},
+}
+CHUNK_SIZE = 5
+MAX_CONCURRENT_CHUNKS = 2  # Chunks of the same report elaborated in parallel, one Edge session each
+
+# --- Post-Processing Configuration ---
+MERGE_CHUNK_ROWS = 100_000  # Rows read at a time when streaming model files
+MERGE_WORKERS = 4  # Processes parsing model files in parallel (1 = serial streaming merge)
+MERGE_START_METHOD = "forkserver" if sys.platform != "win32" else "spawn"  # How merge worker processes start (see merge_process_pool)
+MERGE_COMPARE_SERIAL = False  # Also run the serial merge and print both timings
+PIPELINE_WORKERS = 8  # Pipeline stages (downloads and post-processing) running at the same time
+INTERMEDIATE_FOLDER_NAME = "Intermediate"  # Columnar (Parquet) files shared by the post-processing stages
+INTERMEDIATE_COMPRESSION = "zstd"
+MERGED_61 = "merged_61"  # Filtered merge of the Report 61 model files
+MERGED_29 = "merged_29"
+STORE_61 = "report_61"  # Final tables, also exported to Excel
+STORE_32 = "report_32"
+PFEP_STORE = "pfep"
+COMPARE_SNAPSHOT_KEYS = "compare_snapshot_keys"  # Phase-in/phase-out keys of the last comparison
+COMPARE_SNAPSHOT_WEIGHTS = "compare_snapshot_weights"  # Weights chosen for its phase-in part numbers
+COMPARE_SNAPSHOT_MAX_AGE_DAYS = WEIGHT_CACHE_TTL_DAYS  # Older snapshots are only used for the change log
+COMPARE_CHANGE_LOG_FILE = "Alterações Comparativo.xlsx"
+COMPARE_WEIGHT_TOLERANCE_KG = 1e-6
+COMPARE_PHASE_IN = "phase-in"
+COMPARE_PHASE_OUT = "phase-out"
+CHANGE_NEW_PHASE_IN = "Novo phase-in"
+CHANGE_RESOLVED_PHASE_IN = "Phase-in resolvido"
+CHANGE_NEW_PHASE_OUT = "Novo phase-out"
+CHANGE_RESOLVED_PHASE_OUT = "Phase-out resolvido"
+CHANGE_WEIGHT = "Peso alterado"
+PFEP_HEADER_ROW = 9
+PFEP_COLUMNS = ['Part Number', 'Modelo', 'Descricao PN', 'Peso unitario PN (kg)']
+_BOM_DTYPES = {  # Report 61 and 29 model files share the same layout
+    'nidElementParent': "int32",
+    'vcCodeParent': "str",
+    'nidElementTypeParent': "category",
+    'vcDescriptionParent': "category",  # Few distinct descriptions, repeated on every row
+    'vcCode': "str",
+    'nidElementType': "category",
+    'nLevel': "category",
+    'nidSupplyType': "category",
+    'vcDescription': "category",
+    'fQty': "float32",
+    'Model': "category",
+}
+REPORT_SCHEMAS = {  # Dtypes ("str", "category", "float32" or an integer type) and renames applied by every loader
+    "61": {
+        "dtypes": {**_BOM_DTYPES, 'vcCode': "int64"},
+        "renames": {'vcCode': 'PartNumber'},
+        "required": ['vcCode'],  # Rows whose part number is not a number are dropped
+    },
+    "29": {"dtypes": _BOM_DTYPES, "renames": {}},
+    "32": {
+        "dtypes": {'ElementNode': "str", 'DescriptionElementNode': "str", 'Weight': "float32"},
+        "renames": {'ElementNode': 'PartNumber', 'DescriptionElementNode': 'Descrição', 'Weight': 'Peso'},
+    },
+    "pfep": {
+        "dtypes": {'Part Number': "str", 'Modelo': "category", 'Descricao PN': "str", 'Peso unitario PN (kg)': "float32"},
+        "renames": {},
+    },
+}
+EXCEL_MAX_ROWS = 1_048_576  # Excel's hard row limit per sheet
+EXCEL_SPLIT_MODE = "sheets"  # "sheets" or "files": how tables over the row limit are split
+EXCEL_WRITE_BLOCK_ROWS = 50_000  # Rows converted to Python values at a time while exporting
+
+# --- Incremental Runs ---
+RUN_MANIFEST_FILE = "run_manifest.json"  # Saved inside the Reports folder
+MANIFEST_MAX_AGE_HOURS = 12  # A downloaded model file is reused for this long (same date filter only)
+JOB_JOURNAL_FILE = "job_journal.json"  # Saved inside the Reports folder
+JOB_JOURNAL_MAX_AGE_HOURS = 12  # Submitted elaborations older than this are not resumed
+REUSE_FINISHED_ELABORATIONS = True  # Download finished elaborations (same model, type and date filter) instead of resubmitting them...
+ELABORATION_REUSE_MAX_AGE_HOURS = 12  # ...requested less than this long ago
+
+# dgElaborationRequests: the status column is fixed; the columns the reuse lookup reads are found by
+# their header text (case-insensitive), and the lookup is skipped with a warning if one is missing
+ELAB_GRID_COL_STATUS = 3  # 0-based <td> position; gold background while the elaboration is running
+ELAB_GRID_HEADERS = {
+    "requested": ("Requested", "Request Date", "Date Request", "Data Solicitação"),
+    "type": ("Type", "Elaboration Type", "Tipo"),
+    "model": ("Model", "Modelo"),
+    "date_filter": ("Date Filter", "Filtro Data"),
+}
+ELAB_GRID_DATETIME_FORMATS = ("%m/%d/%Y %H:%M:%S", "%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M")
+
+# --- Elaboration Readiness Polling ---
+ELABORATION_HISTORY_FILE = "elaboration_history.json"  # Saved inside the Reports folder
+ELABORATION_HISTORY_SIZE = 10  # Durations kept per report type and model
+ELABORATION_DEFAULT_SECONDS = 180  # Expected duration for models without history
+POLL_MIN_SECONDS = 3
+POLL_MAX_SECONDS = 60
+POLL_BACKOFF_FACTOR = 1.5
+MODEL_TIMEOUT_FACTOR = 3  # A model times out after this multiple of its expected duration...
+MODEL_TIMEOUT_MIN_SECONDS = 5 * 60  # ...but never sooner than this
+MODEL_TIMEOUT_MAX_SECONDS = 30 * 60  # ...and never later than this
+
+# --- Edge Session Pool Configuration ---
+EDGE_POOL_SIZE = 1 + 2 * MAX_CONCURRENT_CHUNKS  # Report 32 + parallel chunks of Reports 29 and 61
+EDGE_LEASE_TIMEOUT_SECONDS = 600
+EDGE_OPEN_ATTEMPTS = 3  # A lease gives up after this many failed session opens in a row
+
+# --- Download Watcher Configuration ---
+PARTIAL_DOWNLOAD_SUFFIXES = ('.crdownload', '.tmp', '.partial')
+DOWNLOAD_SETTLE_SECONDS = 0.3  # File size must stay unchanged this long to count as complete
+DOWNLOAD_POLL_SECONDS = 0.1  # Fallback polling interval where inotify is unavailable
+
+# --- Download Backend Configuration ---
+DOWNLOAD_BACKEND = "browser"  # "browser" clicks through the grid; "http" fetches the files directly
+HTTP_DOWNLOAD_STREAMS = 4
+HTTP_DOWNLOAD_RETRIES = 3
+HTTP_READ_TIMEOUT_SECONDS = 120
+HTTP_CHUNK_BYTES = 256 * 1024
+
+# --- GUI Log ---
+LOG_POLL_MS = 100
+LOG_MAX_LINES = 5000  # Lines kept in the log window; older lines are dropped
+LOG_MAX_BATCH_MESSAGES = 20_000  # Fragments moved from the queue to the window per tick
+LOG_FILE = "pfep_monitor.log"  # Full log, next to the executable
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+# --- Command Line ---
+PIPELINE_STAGE_GROUPS = {  # Group name → stage name prefixes it selects
+    "download": ("Report-", "EdgePool-"),
+    "process": ("Merge-", "Final-", "Convert-"),
+    "compare": ("Compare",),
+}
+PIPELINE_STAGE_OUTPUTS = {  # Checked after the run: a selected stage must have (re)written its file
+    "Final-61": "Todos Modelos_61.xlsx",
+    "Final-29": "Todos Modelos_29.xlsx",
+    "Convert-32": "Relatorio 32.xlsx",
+    "Compare": "Todos Comparativos.xlsx",
+}
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_SETUP_ERROR = 2
+EXIT_INTERRUPTED = 130
+STARTUP_MEASURE_RUNS = 5
+STARTUP_EAGER_MODULES = ["pandas", "pyarrow.parquet", "tkinter.scrolledtext", "selenium.webdriver",
+                         "playwright.sync_api", "playwright.async_api", "xlsxwriter", "urllib3"]
+
+# --- Tracing ---
+TRACE_FILE = "trace.jsonl"  # Saved inside the Reports folder, one span per line
+TRACE_SUMMARY_TOP = 10  # Slowest individual spans listed in the end-of-run summary
+
+
+def get_base_path():
+    """Folder of the packaged .exe, or of this script when run from source."""
+    return os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+
+
+def build_authenticated_url(base_url, credentials):
+    """Builds the basic-auth URL used to log into the RTM portal."""
+    return f"{PORTAL_SCHEME}://{credentials['Usuario']}:{credentials['Senha']}@{base_url}"
+
+# ====================================================================================
+# --- TRACING ---
+# ====================================================================================
+
+class Span:
+    """One timed step of a run. Attributes (model, bytes, ...) can be added while it is open."""
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.thread = threading.current_thread().name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """
+    Nested timing spans for a run, exported as JSON lines (one span per line, written when it ends).
+    The current span follows the code through a context variable; work handed to other threads
+    is linked by running it in a copied context (traced_submit) or by passing `parent` explicitly.
+    """
+    def __init__(self):
+        self.trace_id = None
+        self.spans = []
+        self._file = None
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar("current_span", default=None)
+
+    def start_trace(self, path):
+        with self._lock:
+            self.trace_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+            self.spans = []
+            try:
+                self._file = open(path, 'a', encoding='utf-8')
+            except OSError as e:
+                self._file = None
+                print(f"WARNING: Could not open trace file {path}. {e}")
+
+    def end_trace(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def current(self):
+        return self._current.get()
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        parent = parent or self._current.get()
+        span = Span(name, parent.span_id if parent else None, attributes)
+        token = self._current.set(span)
+        start_time = time.time()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._current.reset(token)
+            self._finish(span, start_time, time.time())
+
+    def record(self, name, start_time, end_time, parent=None, **attributes):
+        """Adds a span measured after the fact, e.g. an elaboration seen ready by the poller."""
+        parent = parent or self._current.get()
+        self._finish(Span(name, parent.span_id if parent else None, attributes), start_time, end_time)
+
+    def _finish(self, span, start_time, end_time):
+        entry = {
+            "trace_id": self.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "thread": span.thread,
+            "start": round(start_time, 3),
+            "duration": round(end_time - start_time, 3),
+            "attributes": span.attributes,
+        }
+        with self._lock:
+            self.spans.append(entry)
+            if self._file:
+                self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+
+tracer = Tracer()
+
+
+def traced(name=None):
+    """Decorator: runs the function inside a span named after it."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_submit(executor, function, *args, **kwargs):
+    """executor.submit that keeps the caller's current span as the parent of the work."""
+    return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+
+def load_trace(path, trace_id=None):
+    """Spans of one trace from a JSON-lines file (the last trace in the file by default)."""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+    if trace_id is None and spans:
+        trace_id = spans[-1]["trace_id"]
+    return [s for s in spans if s["trace_id"] == trace_id]
+
+
+def print_trace_summary(spans, top=TRACE_SUMMARY_TOP):
+    """Where the run spent its time: totals and self time per span name, then the slowest single spans."""
+    if not spans:
+        print("No spans recorded.")
+        return
+    # Self time: a span's duration minus its direct children (children running in parallel can cover it all)
+    children_time = {}
+    for span in spans:
+        if span["parent_id"]:
+            children_time[span["parent_id"]] = children_time.get(span["parent_id"], 0) + span["duration"]
+    by_name = {}
+    for span in spans:
+        self_time = max(span["duration"] - children_time.get(span["span_id"], 0), 0)
+        by_name.setdefault(span["name"], []).append((span["duration"], self_time))
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["duration"] for s in spans)
+    print(f"\n--- 🔎 Trace summary ({len(spans)} spans, {end - start:.1f}s wall) ---")
+    print(f"{'span':<28}{'count':>7}{'total s':>11}{'self s':>10}{'mean s':>10}{'max s':>10}")
+    for name, timings in sorted(by_name.items(), key=lambda item: sum(t for _, t in item[1]), reverse=True):
+        durations = [d for d, _ in timings]
+        print(f"{name:<28}{len(durations):>7}{sum(durations):>11.1f}{sum(t for _, t in timings):>10.1f}"
+              f"{sum(durations) / len(durations):>10.2f}{max(durations):>10.2f}")
+    print("Slowest spans:")
+    for span in sorted(spans, key=lambda s: s["duration"], reverse=True)[:top]:
+        details = ", ".join(f"{k}={v}" for k, v in span["attributes"].items())
+        print(f"  {span['duration']:>8.1f}s  {span['name']} [{span['thread']}] {details}")
+
+# ====================================================================================
+# --- EDGE SESSION POOL ---
+# ====================================================================================
+
+class EdgeSession:
+    """
+    A single authenticated Edge browser together with its private download folder.
+    """
+    def __init__(self, name, driver, download_path):
+        self.name = name
+        self.driver = driver
+        self.download_path = download_path
+
+    def is_alive(self):
+        """Health check: a crashed browser or driver fails any round trip."""
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def clear_downloads(self):
+        for f in os.listdir(self.download_path):
+            os.remove(os.path.join(self.download_path, f))
+
+
+class EdgeSessionPool:
+    """
+    Opens N authenticated Edge sessions once per run and leases them to report tasks.
+    Sessions that stop responding are discarded and replaced on the next lease, so
+    every report page is served from a warm, already logged-in browser.
+    """
+    def __init__(self, driver_path, reports_path, credentials, size=EDGE_POOL_SIZE):
+        self.driver_path = driver_path
+        self.reports_path = reports_path
+        self.credentials = credentials
+        self.size = size
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._reserved = 0  # Sessions being opened right now
+        self._counter = 0
+
+    def start(self):
+        """Opens all sessions in parallel so the cold starts overlap."""
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            sessions = list(executor.map(lambda _: self._try_open_session(), range(self.size)))
+        opened = [s for s in sessions if s]
+        for session in opened:
+            self._idle.put(session)
+        print(f"[EdgePool] ✅ {len(opened)}/{self.size} Edge sessions ready in {time.time() - start_time:.1f}s.")
+
+    def _try_open_session(self):
+        with self._lock:
+            self._reserved += 1
+        try:
+            return self._open_session()
+        except Exception as e:
+            print(f"[EdgePool] ❌ ERROR: Could not open Edge session. {e}")
+            return None
+        finally:
+            with self._lock:
+                self._reserved -= 1
+
+    def _open_session(self):
+        from selenium import webdriver
+        from selenium.webdriver.edge.options import Options as EdgeOptions
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+        with self._lock:
+            self._counter += 1
+            name = f"Edge-{self._counter}"
+        download_path = os.path.join(self.reports_path, f"temp_{name}_{os.getpid()}")
+        os.makedirs(download_path, exist_ok=True)
+        edge_options = EdgeOptions()
+        prefs = {"download.default_directory": download_path}
+        edge_options.add_experimental_option("prefs", prefs)
+        edge_options.add_argument("--inprivate")
+        edge_options.add_argument("--log-level=3")
+        edge_options.add_argument("--headless") # Optional: Run browser in background
+        service = webdriver.edge.service.Service(self.driver_path)
+        driver = webdriver.Edge(service=service, options=edge_options)
+        try:
+            # Log in once; the browser keeps the basic-auth state for the whole run
+            driver.get(build_authenticated_url(BASE_URL, self.credentials))
+            WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.ID, "ddlProcedures")))
+        except Exception:
+            driver.quit()
+            shutil.rmtree(download_path, ignore_errors=True)
+            raise
+        session = EdgeSession(name, driver, download_path)
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def _discard(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(session.download_path, ignore_errors=True)
+
+    def _acquire(self, timeout):
+        from selenium.common.exceptions import TimeoutException
+        deadline = time.time() + timeout
+        failed_opens = 0
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = len(self._sessions) + self._reserved < self.size
+                if can_open:
+                    session = self._try_open_session()
+                    if session is None:
+                        # Driver missing, bad credentials or portal down: fail the lease instead of retrying forever
+                        failed_opens += 1
+                        remaining = deadline - time.time()
+                        if failed_opens >= EDGE_OPEN_ATTEMPTS or remaining <= 0:
+                            raise TimeoutException(f"Could not open an Edge session ({failed_opens} attempts).")
+                        time.sleep(min(remaining, 5))
+                        continue
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutException(f"No Edge session became available within {timeout}s.")
+                    try:
+                        session = self._idle.get(timeout=min(remaining, 5))
+                    except queue.Empty:
+                        continue
+            if session.is_alive():
+                session.clear_downloads()
+                return session
+            print(f"[EdgePool] ♻️ Session {session.name} is not responding. Recycling it.")
+            self._discard(session)
+
+    def _release(self, session):
+        if session.is_alive():
+            self._idle.put(session)
+        else:
+            print(f"[EdgePool] ♻️ Session {session.name} crashed during use. Recycling it.")
+            self._discard(session)
+
+    @contextmanager
+    def lease(self, timeout=EDGE_LEASE_TIMEOUT_SECONDS):
+        """Context manager that lends a healthy, authenticated session to the caller."""
+        session = self._acquire(timeout)
+        try:
+            yield session
+        finally:
+            self._release(session)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions)
+        if not sessions:
+            return
+        for session in sessions:
+            self._discard(session)
+        print(f"[EdgePool] Closed {len(sessions)} Edge sessions.")
+
+# ====================================================================================
+# --- REPORT DOWNLOADS ---
+# ====================================================================================
+
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify, used to wake up on download folder changes."""
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def wait(self, timeout):
+        """Blocks until the folder changes or the timeout expires. Returns True on change."""
+        readable, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DownloadWatcher:
+    """
+    Waits for a browser download to finish in a folder.
+    On Linux the watcher sleeps on inotify events (Edge renames '.crdownload' to the final
+    name when the download completes); elsewhere it falls back to short polling. A file only
+    counts as complete once its size has stayed unchanged for DOWNLOAD_SETTLE_SECONDS.
+    Create it before triggering the download so `elapsed` covers the whole transfer.
+    """
+    def __init__(self, download_path):
+        self.download_path = download_path
+        self.start_time = time.time()
+        self.elapsed = None
+        self._inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(download_path)
+            except (OSError, AttributeError, TypeError):
+                self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def _completed_file(self):
+        for entry in os.scandir(self.download_path):
+            if entry.is_file() and not entry.name.endswith(PARTIAL_DOWNLOAD_SUFFIXES):
+                return entry.path
+        return None
+
+    def _sleep(self, timeout):
+        if self._inotify:
+            self._inotify.wait(timeout)
+        else:
+            time.sleep(min(timeout, DOWNLOAD_POLL_SECONDS))
+
+    def wait(self, timeout):
+        """Returns the path of the completed download, or None if it did not finish in time."""
+        deadline = self.start_time + timeout
+        candidate, last_size, stable_since = None, None, None
+        while True:
+            now = time.time()
+            path = self._completed_file()
+            if path:
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = None
+                if path != candidate or size != last_size:
+                    candidate, last_size, stable_since = path, size, now
+                elif size is not None and now - stable_since >= DOWNLOAD_SETTLE_SECONDS:
+                    self.elapsed = now - self.start_time
+                    return candidate
+            if now >= deadline:
+                self.elapsed = now - self.start_time
+                return None
+            next_check = DOWNLOAD_SETTLE_SECONDS if candidate else deadline - now
+            self._sleep(min(next_check, deadline - now))
+
+
+# ====================================================================================
+# --- DIRECT HTTP DOWNLOAD BACKEND ---
+# ====================================================================================
+
+class _PortalPageParser(HTMLParser):
+    """
+    Collects what the HTTP backend needs from an ASP.NET portal page: the form action,
+    the hidden postback fields, every anchor and the rows of dgElaborationRequests.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form_action = None
+        self.hidden_fields = {}
+        self.anchors = {}
+        self.grid_rows = []
+        self._grid_depth = 0
+        self._current_row = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self.form_action is None:
+            self.form_action = attrs.get("action")
+        elif tag == "input" and (attrs.get("type") or "").lower() == "hidden" and attrs.get("name"):
+            self.hidden_fields[attrs["name"]] = attrs.get("value") or ""
+        elif tag == "table":
+            if self._grid_depth or attrs.get("id") == "dgElaborationRequests":
+                self._grid_depth += 1
+        elif tag == "tr" and self._grid_depth:
+            self._current_row = {"text": [], "anchors": [], "cells": []}
+            self.grid_rows.append(self._current_row)
+        elif tag in ("td", "th") and self._current_row is not None:
+            self._current_row["cells"].append({"text": [], "style": attrs.get("style") or ""})
+        elif tag == "a":
+            if attrs.get("id"):
+                self.anchors[attrs["id"]] = attrs.get("href") or ""
+            if self._current_row is not None:
+                self._current_row["anchors"].append(attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self._grid_depth:
+            self._grid_depth -= 1
+            if not self._grid_depth:
+                self._current_row = None
+        elif tag == "tr":
+            self._current_row = None
+
+    def handle_data(self, data):
+        if self._current_row is not None:
+            self._current_row["text"].append(data)
+            if self._current_row["cells"]:
+                self._current_row["cells"][-1]["text"].append(data)
+
+
+class PortalHttpFetcher:
+    """
+    Downloads elaborated report files straight over HTTP, bypassing the
+    cmdListFiles -> dgFiles_hlkDownloadFile_0 -> back() click sequence.
+    The authenticated cookies are taken from an Edge session once; the grid's
+    ASP.NET postbacks are replayed with a pooled urllib3 client, files are streamed
+    to disk and partial downloads are resumed with HTTP Range requests.
+    """
+    def __init__(self, cookies, credentials, user_agent=None, streams=HTTP_DOWNLOAD_STREAMS):
+        headers = urllib3.make_headers(basic_auth=f"{credentials['Usuario']}:{credentials['Senha']}")
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+        if user_agent:
+            headers["User-Agent"] = user_agent
+        self.headers = headers
+        self.streams = streams
+        self.http = urllib3.PoolManager(
+            maxsize=streams,
+            block=True,
+            retries=False,
+            timeout=urllib3.Timeout(connect=30, read=HTTP_READ_TIMEOUT_SECONDS),
+        )
+
+    @classmethod
+    def from_driver(cls, driver, credentials, streams=HTTP_DOWNLOAD_STREAMS):
+        cookies = driver.get_cookies()
+        user_agent = driver.execute_script("return navigator.userAgent;")
+        return cls(cookies, credentials, user_agent=user_agent, streams=streams)
+
+    def _get_page(self, url, fields=None):
+        if fields is None:
+            response = self.http.request("GET", url, headers=self.headers)
+        else:
+            response = self.http.request("POST", url, headers=self.headers, fields=fields, encode_multipart=False)
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(f"HTTP {response.status} for {url}")
+        parser = _PortalPageParser()
+        parser.feed(response.data.decode("utf-8", errors="replace"))
+        return parser
+
+    def _file_url(self, results_url, grid_page, activity_id):
+        """Resolves the download link of an activity by replaying its cmdListFiles postback."""
+        for row in grid_page.grid_rows:
+            if activity_id not in "".join(row["text"]):
+                continue
+            for anchor in row["anchors"]:
+                if not (anchor.get("id") or "").startswith("dgElaborationRequests_cmdListFiles_"):
+                    continue
+                href = anchor.get("href") or ""
+                postback = re.search(r"__doPostBack\('([^']+)','([^']*)'\)", href)
+                if postback:
+                    fields = dict(grid_page.hidden_fields)
+                    fields["__EVENTTARGET"] = postback.group(1)
+                    fields["__EVENTARGUMENT"] = postback.group(2)
+                    form_url = urljoin(results_url, grid_page.form_action or results_url)
+                    files_page = self._get_page(form_url, fields)
+                    page_url = form_url
+                else:
+                    page_url = urljoin(results_url, href)
+                    files_page = self._get_page(page_url)
+                download_href = files_page.anchors.get("dgFiles_hlkDownloadFile_0")
+                if not download_href:
+                    raise FileNotFoundError(f"No file listed for Activity ID {activity_id}.")
+                return urljoin(page_url, download_href)
+        raise LookupError(f"Activity ID {activity_id} not found in dgElaborationRequests.")
+
+    def download(self, url, dest_without_extension):
+        """
+        Streams a file to disk, resuming from the partial file after a failed attempt of this call
+        (a partial left by an earlier run may belong to another elaboration, so it is discarded).
+        The file is only moved into place once its size matches the size the server announced.
+        Returns the saved path.
+        """
+        partial_path = dest_without_extension + ".partial"
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        last_error = None
+        for attempt in range(1, HTTP_DOWNLOAD_RETRIES + 1):
+            offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+            headers = dict(self.headers)
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                response = self.http.request("GET", url, headers=headers, preload_content=False)
+                try:
+                    expected_size = _response_total_size(response)
+                    if response.status == 416 and offset:
+                        extension = _response_extension(response, url)
+                    elif response.status in (200, 206):
+                        extension = _response_extension(response, url)
+                        mode = "ab" if response.status == 206 else "wb"
+                        with open(partial_path, mode) as f:
+                            for data in response.stream(HTTP_CHUNK_BYTES):
+                                f.write(data)
+                    else:
+                        raise urllib3.exceptions.HTTPError(f"HTTP {response.status} for {url}")
+                finally:
+                    response.release_conn()
+                saved_size = os.path.getsize(partial_path)
+                if expected_size is not None and saved_size != expected_size:
+                    if saved_size > expected_size:
+                        os.remove(partial_path)
+                    raise urllib3.exceptions.HTTPError(f"Got {saved_size} of {expected_size} bytes for {url}")
+                final_path = dest_without_extension + extension
+                os.replace(partial_path, final_path)
+                return final_path
+            except (urllib3.exceptions.HTTPError, OSError) as e:
+                last_error = e
+                time.sleep(attempt)
+        raise last_error
+
+    def _fetch_one(self, results_url, grid_page, activity_id, model_name, modelos_folder_path, thread_name, on_file_saved):
+        start_time = time.time()
+        with tracer.span("model.download", model=model_name, activity_id=activity_id, backend="http") as span:
+            file_url = self._file_url(results_url, grid_page, activity_id)
+            saved_path = self.download(file_url, os.path.join(modelos_folder_path, model_name))
+            span.set(bytes=os.path.getsize(saved_path))
+        size_kb = os.path.getsize(saved_path) / 1024
+        print(f"[{thread_name}] -> 💾 File successfully saved as: {os.path.basename(saved_path)} ({size_kb:.0f} KB over HTTP in {time.time() - start_time:.1f}s)")
+        if on_file_saved:
+            on_file_saved(model_name, saved_path)
+        return saved_path
+
+    def fetch_chunk(self, results_url, activity_to_model_map, modelos_folder_path, thread_name, on_file_saved=None):
+        """
+        Downloads every activity of a chunk in parallel streams.
+        Returns the {activity_id: model_name} map of the downloads that failed.
+        """
+        os.makedirs(modelos_folder_path, exist_ok=True)
+        try:
+            grid_page = self._get_page(results_url)
+        except Exception as e:
+            print(f"[{thread_name}] -> ⚠️ WARNING: Could not read the elaboration grid over HTTP: {e}")
+            return dict(activity_to_model_map)
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.streams) as executor:
+            futures = {
+                traced_submit(executor, self._fetch_one, results_url, grid_page, activity_id, model_name, modelos_folder_path, thread_name, on_file_saved): activity_id
+                for activity_id, model_name in activity_to_model_map.items()
+            }
+            for future, activity_id in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failed[activity_id] = activity_to_model_map[activity_id]
+                    print(f"[{thread_name}] -> ⚠️ WARNING: HTTP download failed for '{activity_to_model_map[activity_id]}': {e}")
+        return failed
+
+
+def _response_total_size(response):
+    """Full file size from Content-Range (206/416) or Content-Length (200), or None if not announced."""
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None  # Sizes announced for the encoded body, not the decoded file
+    content_range = response.headers.get("Content-Range", "")
+    match = re.search(r"/(\d+)$", content_range)
+    if match:
+        return int(match.group(1))
+    if response.status == 200 and response.headers.get("Content-Length", "").isdigit():
+        return int(response.headers["Content-Length"])
     return None
 
-def download_standard_report(report_id, new_filename_base, driver_path, reports_path, credentials):
+
+def _response_extension(response, url):
+    disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposition, re.IGNORECASE)
+    name = match.group(1) if match else urlparse(url).path
+    return os.path.splitext(name)[1] or ".csv"
+
+
+def download_standard_report(report_id, new_filename_base, session_pool, reports_path, credentials):
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException
     thread_name = threading.current_thread().name
     print(f"[{thread_name}] Starting download for Standard Report ID: {report_id}")
-    temp_download_path = os.path.join(reports_path, f"temp_{report_id}_{threading.get_ident()}")
-    os.makedirs(temp_download_path, exist_ok=True)
-    edge_options = EdgeOptions()
-    prefs = {"download.default_directory": temp_download_path}
-    edge_options.add_experimental_option("prefs", prefs)
-    edge_options.add_argument("--inprivate")
-    edge_options.add_argument("--log-level=3")
-    edge_options.add_argument("--headless") # Optional: Run browser in background
-    authenticated_url = f"https://{credentials['Usuario']}:{credentials['Senha']}@{BASE_URL}"
-    service = webdriver.edge.service.Service(driver_path)
-    driver = webdriver.Edge(service=service, options=edge_options)
+    authenticated_url = build_authenticated_url(BASE_URL, credentials)
     try:
-        driver.get(authenticated_url)
-        wait = WebDriverWait(driver, 60)
-        Select(wait.until(EC.presence_of_element_located((By.ID, "ddlProcedures")))).select_by_value(report_id)
-        wait.until(EC.element_to_be_clickable((By.ID, "dgActivities_cmdListFiles_0"))).click()
-        wait.until(EC.element_to_be_clickable((By.LINK_TEXT, "Download"))).click()
-        downloaded_filepath = wait_and_get_downloaded_file(temp_download_path, 120)
-        if not downloaded_filepath:
-            raise TimeoutException("Download did not complete within the timeout period.")
-        file_extension = os.path.splitext(downloaded_filepath)[1]
-        final_filename = f"{new_filename_base}{file_extension}"
-        final_filepath = os.path.join(reports_path, final_filename)
-        if os.path.exists(final_filepath):
-            os.remove(final_filepath)
-        shutil.move(downloaded_filepath, final_filepath)
-        print(f"[{thread_name}] ✅ File successfully saved as: {final_filename}")
+        with tracer.span("report.download", report=report_id) as span, session_pool.lease() as session:
+            driver = session.driver
+            temp_download_path = session.download_path
+            driver.get(authenticated_url)
+            wait = WebDriverWait(driver, 60)
+            Select(wait.until(EC.presence_of_element_located((By.ID, "ddlProcedures")))).select_by_value(report_id)
+            wait.until(EC.element_to_be_clickable((By.ID, "dgActivities_cmdListFiles_0"))).click()
+            with DownloadWatcher(temp_download_path) as watcher:
+                wait.until(EC.element_to_be_clickable((By.LINK_TEXT, "Download"))).click()
+                downloaded_filepath = watcher.wait(120)
+            if not downloaded_filepath:
+                raise TimeoutException("Download did not complete within the timeout period.")
+            file_extension = os.path.splitext(downloaded_filepath)[1]
+            final_filename = f"{new_filename_base}{file_extension}"
+            final_filepath = os.path.join(reports_path, final_filename)
+            if os.path.exists(final_filepath):
+                os.remove(final_filepath)
+            shutil.move(downloaded_filepath, final_filepath)
+            span.set(bytes=os.path.getsize(final_filepath))
+            print(f"[{thread_name}] ✅ File successfully saved as: {final_filename} (downloaded in {watcher.elapsed:.1f}s)")
+            return final_filepath
     except Exception as e:
         print(f"\n[{thread_name}] ❌ ERROR: An unexpected error occurred. {e}")
-    finally:
-        driver.quit()
-        if os.path.exists(temp_download_path):
-            shutil.rmtree(temp_download_path)
+    return None
 
-def process_report_29(new_filename_base, driver_path, reports_path, credentials, base_path):
+class JsonStore:
     """
-    Handles the special multi-step generation and download for Report 29.
-    Uses the same stable logic as process_report_61.
+    A small JSON file shared by every thread of the run: one instance per path (for_path),
+    changes made under self._lock and saved atomically (temporary file + os.replace), so a crash
+    or closing the app mid-write never leaves a truncated file behind.
+    """
+    label = "JSON store"  # Named in the save warning
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    @classmethod
+    def for_path(cls, path):
+        with cls._instances_lock:
+            if (cls, path) not in cls._instances:
+                cls._instances[(cls, path)] = cls(path)
+            return cls._instances[(cls, path)]
+
+    def _save(self):
+        # Called with self._lock held
+        try:
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"WARNING: Could not save {self.label}. {e}")
+
+
+class RunManifest(JsonStore):
+    """
+    Records, per report type and model, the downloaded file with its download time,
+    date filter, size and SHA-256, so a re-run can skip models whose file is still fresh.
+    """
+    label = "run manifest"
+
+    def record(self, report_id, model_name, file_path, date_filter):
+        entry = {
+            "file": os.path.basename(file_path),
+            "downloaded_at": time.time(),
+            "date_filter": date_filter,
+            "size": os.path.getsize(file_path),
+            "sha256": _file_sha256(file_path),
+        }
+        with self._lock:
+            self.data.setdefault(report_id, {})[model_name] = entry
+            self._save()
+
+    def is_fresh(self, report_id, model_name, folder_path, date_filter):
+        """
+        Freshness policy: the file was downloaded less than MANIFEST_MAX_AGE_HOURS ago with
+        the same date filter, and it is still on disk with the recorded size and hash.
+        """
+        with self._lock:
+            entry = self.data.get(report_id, {}).get(model_name)
+        if not entry or entry.get("date_filter") != date_filter:
+            return False
+        if time.time() - entry.get("downloaded_at", 0) > MANIFEST_MAX_AGE_HOURS * 3600:
+            return False
+        file_path = os.path.join(folder_path, entry["file"])
+        try:
+            if os.path.getsize(file_path) != entry["size"]:
+                return False
+            return _file_sha256(file_path) == entry["sha256"]
+        except OSError:
+            return False
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JobJournal(JsonStore):
     """
-    thread_name = "Report-29"
-    print(f"\n--- [{thread_name}] Starting special process for Report 29 ---")
+    Every elaboration submitted to the portal, per report type and activity ID, with its
+    model, submit time, date filter, results page (the portal's own "View requests" link,
+    without credentials) and download state ("submitted", "downloaded" or "missing").
+    Written as soon as each activity is submitted, so a run interrupted by an Edge crash or by
+    closing the app can pick up the same activities from dgElaborationRequests instead of
+    submitting every model again.
+    """
+    label = "job journal"
+
+    def _save(self):
+        # Called with self._lock held; entries past JOB_JOURNAL_MAX_AGE_HOURS are dropped
+        cutoff = time.time() - JOB_JOURNAL_MAX_AGE_HOURS * 3600
+        for jobs in self.data.values():
+            for activity_id in [a for a, job in jobs.items() if job.get("submitted_at", 0) < cutoff]:
+                del jobs[activity_id]
+        super()._save()
+
+    def record_submitted(self, report_id, activity_id, model_name, submitted_at, date_filter, results_address=None):
+        entry = {
+            "model": model_name,
+            "submitted_at": submitted_at,
+            "date_filter": date_filter,
+            "results_url": results_address,
+            "state": "submitted",
+        }
+        with self._lock:
+            self.data.setdefault(report_id, {})[activity_id] = entry
+            self._save()
+
+    def mark(self, report_id, activity_ids, state):
+        with self._lock:
+            jobs = self.data.get(report_id, {})
+            for activity_id in activity_ids:
+                if activity_id in jobs:
+                    jobs[activity_id]["state"] = state
+            self._save()
+
+    def mark_model_downloaded(self, report_id, model_name):
+        with self._lock:
+            for job in self.data.get(report_id, {}).values():
+                if job["model"] == model_name and job["state"] == "submitted":
+                    job["state"] = "downloaded"
+            self._save()
+
+    def results_address(self, report_id):
+        """Results page of the newest journaled submission of the report (host/path?query), or None."""
+        with self._lock:
+            jobs = [job for job in self.data.get(report_id, {}).values() if job.get("results_url")]
+        return max(jobs, key=lambda job: job["submitted_at"])["results_url"] if jobs else None
+
+    def pending(self, report_id, date_filter, model_names):
+        """
+        {activity_id: (model_name, submitted_at)} of the latest not yet downloaded activity of
+        each given model, submitted with the same date filter less than JOB_JOURNAL_MAX_AGE_HOURS ago.
+        """
+        cutoff = time.time() - JOB_JOURNAL_MAX_AGE_HOURS * 3600
+        latest = {}
+        with self._lock:
+            for activity_id, job in self.data.get(report_id, {}).items():
+                if job["model"] not in model_names or job.get("date_filter") != date_filter or job["submitted_at"] < cutoff:
+                    continue
+                if job["model"] not in latest or job["submitted_at"] > latest[job["model"]][1]["submitted_at"]:
+                    latest[job["model"]] = (activity_id, job)
+        return {activity_id: (model_name, job["submitted_at"])
+                for model_name, (activity_id, job) in latest.items() if job["state"] == "submitted"}
+
+
+def _elaboration_date_filter():
+    """Date filter sent with every elaboration: six months from today, as M/D/YYYY."""
+    future_date = date.today() + relativedelta(months=+6)
+    return f"{future_date.month}/{future_date.day}/{future_date.year}"
+
+
+def _load_models(base_path, thread_name):
+    """Loads Modelos.json as a list of (model_name, model_text) pairs."""
     modelos_json_path = os.path.join(base_path, JSON_MODELS_FILE)
     try:
         with open(modelos_json_path, 'r', encoding='utf-8') as f:
             models_to_process = json.load(f)
-        all_models_list = list(models_to_process.items())
-        chunk_size = 5
-        model_chunks = [all_models_list[i:i + chunk_size] for i in range(0, len(all_models_list), chunk_size)]
-        print(f"[{thread_name}] Loaded {len(all_models_list)} models, split into {len(model_chunks)} sequential chunks.")
+        return list(models_to_process.items())
     except Exception as e:
         print(f"[{thread_name}] ERROR: Could not load {JSON_MODELS_FILE}. {e}")
-        return
+        return None
 
-    temp_download_path = os.path.join(reports_path, f"temp_{thread_name}_{os.getpid()}")
-    os.makedirs(temp_download_path, exist_ok=True)
-    edge_options = EdgeOptions()
-    prefs = {"download.default_directory": temp_download_path}
-    edge_options.add_experimental_option("prefs", prefs)
-    edge_options.add_argument("--log-level=3")
-    edge_options.add_argument("--inprivate")
-    edge_options.add_argument("--headless") # Optional: Run browser in background
-    
-    # Using the correct URL for Report 29
-    authenticated_url = f"https://{credentials['Usuario']}:{credentials['Senha']}@{BASE_URL_RELATORIO_29}"
-    service = webdriver.edge.service.Service(driver_path)
-    driver = webdriver.Edge(service=service, options=edge_options)
-    
-    try:
-        for chunk_index, current_chunk in enumerate(model_chunks):
-            print(f"\n[{thread_name}] --- Processing Chunk {chunk_index + 1}/{len(model_chunks)} ---")
-            driver.get(authenticated_url)
-            wait = WebDriverWait(driver, 60)
-            wait.until(EC.presence_of_element_located((By.ID, "MainContent_ddlModel")))
-            
-            # Setting the future date remains the same
-            future_date = date.today() + relativedelta(months=+6)
-            # Correctly handle January for the date string.
-            date_string = f"{future_date.month}/{future_date.day}/{future_date.year}"
-            driver.execute_script(f"arguments[0].value = '{date_string}';", wait.until(EC.presence_of_element_located((By.ID, "MainContent_txtDateFilter2_txtDate"))))
-            
-            activity_to_model_map = {}
-            for model_name, model_text in current_chunk:
-                try:
-                    Select(wait.until(EC.element_to_be_clickable((By.ID, "MainContent_ddlModel")))).select_by_visible_text(model_text)
-                    driver.find_element(By.ID, "MainContent_cmdConfirm").click()
-                    wait.until(EC.text_to_be_present_in_element((By.ID, "MainContent_lblMessage"), "Elaboration correctly executed"))
-                    message_element = wait.until(EC.presence_of_element_located((By.ID, "MainContent_lblMessage")))
-                    message_text = message_element.text
-                    match = re.search(r'\d{7,}', message_text)
-                    if match:
-                        activity_id = match.group(0)
-                        activity_to_model_map[activity_id] = model_name
-                        print(f"[{thread_name}] Submitted '{model_name}', mapped to Activity ID: {activity_id}")
-                    else:
-                        print(f"[{thread_name}] WARNING: Submitted '{model_name}' but could not find Activity ID in text: {message_text}")
-                except (NoSuchElementException, TimeoutException) as e:
-                    print(f"[{thread_name}] WARNING: Model '{model_name}' could not be processed. Skipping. Error: {e}")
-            
-            if not activity_to_model_map:
-                print(f"[{thread_name}] No models in chunk {chunk_index + 1} successfully submitted. Skipping chunk.")
+
+def _submit_chunk(driver, wait, authenticated_url, current_chunk, thread_name, on_submitted=None):
+    """
+    Submits one elaboration per model of the chunk and opens the results page.
+    Returns the {activity_id: model_name} map of the successfully submitted models
+    and the {activity_id: submit timestamp} map used for the readiness ETA.
+    `on_submitted(activity_id, model_name, submitted_at, results_address)` is called right after
+    each submission, with the results page the confirmation message links to (see _portal_address).
+    """
+    from selenium.webdriver.support.ui import Select
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException
+    driver.get(authenticated_url)
+    wait.until(EC.presence_of_element_located((By.ID, "MainContent_ddlModel")))
+
+    # Setting the future date remains the same
+    date_string = _elaboration_date_filter()
+    driver.execute_script(f"arguments[0].value = '{date_string}';", wait.until(EC.presence_of_element_located((By.ID, "MainContent_txtDateFilter2_txtDate"))))
+
+    activity_to_model_map = {}
+    submitted_at = {}
+    for model_name, model_text in current_chunk:
+        try:
+            with tracer.span("model.select", model=model_name):
+                Select(wait.until(EC.element_to_be_clickable((By.ID, "MainContent_ddlModel")))).select_by_visible_text(model_text)
+            with tracer.span("model.confirm", model=model_name):
+                driver.find_element(By.ID, "MainContent_cmdConfirm").click()
+                wait.until(EC.text_to_be_present_in_element((By.ID, "MainContent_lblMessage"), "Elaboration correctly executed"))
+            message_element = wait.until(EC.presence_of_element_located((By.ID, "MainContent_lblMessage")))
+            message_text = message_element.text
+            match = re.search(r'\d{7,}', message_text)
+            if match:
+                activity_id = match.group(0)
+                activity_to_model_map[activity_id] = model_name
+                submitted_at[activity_id] = time.time()
+                print(f"[{thread_name}] Submitted '{model_name}', mapped to Activity ID: {activity_id}")
+                if on_submitted:
+                    results_links = message_element.find_elements(By.CSS_SELECTOR, "a.actlink")
+                    results_address = _portal_address(results_links[0].get_attribute("href")) if results_links else None
+                    on_submitted(activity_id, model_name, submitted_at[activity_id], results_address)
+            else:
+                print(f"[{thread_name}] WARNING: Submitted '{model_name}' but could not find Activity ID in text: {message_text}")
+        except (NoSuchElementException, TimeoutException) as e:
+            print(f"[{thread_name}] WARNING: Model '{model_name}' could not be processed. Skipping. Error: {e}")
+
+    if activity_to_model_map:
+        wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "#MainContent_lblMessage > a.actlink"))).click()
+    return activity_to_model_map, submitted_at
+
+
+def _portal_address(url):
+    """An absolute portal URL as host/path?query, the form build_authenticated_url takes (credentials dropped)."""
+    if not url:
+        return None
+    parts = urlparse(url)
+    host = f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+    return f"{host}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _parse_grid_date(text, date_formats):
+    for date_format in date_formats:
+        try:
+            return datetime.strptime(text.strip(), date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def _elaboration_grid(parser):
+    """
+    Reads the rows of a parsed dgElaborationRequests page as dicts with activity_id, requested
+    (datetime or None), ready, type, model and date_filter (date or None). The first row is the
+    header; columns are located by ELAB_GRID_HEADERS. Returns (rows, missing header names).
+    """
+    if not parser.grid_rows:
+        return [], list(ELAB_GRID_HEADERS)
+    headers = ["".join(cell["text"]).strip().lower() for cell in parser.grid_rows[0]["cells"]]
+    columns = {}
+    for key, names in ELAB_GRID_HEADERS.items():
+        matches = [index for index, header in enumerate(headers) if header in {name.lower() for name in names}]
+        if matches:
+            columns[key] = matches[0]
+    missing = [key for key in ELAB_GRID_HEADERS if key not in columns]
+    if missing:
+        return [], missing
+
+    rows = []
+    for row in parser.grid_rows[1:]:
+        cells = row["cells"]
+        text = ["".join(cell["text"]).strip() for cell in cells]
+        activity_id = next((cell_text for cell_text in text if re.fullmatch(r'\d{7,}', cell_text)), None)
+        if not activity_id or len(cells) <= max(ELAB_GRID_COL_STATUS, *columns.values()):
+            continue  # Pager and other rows without an activity
+        date_filter = _parse_grid_date(text[columns["date_filter"]].split(" ")[0], ("%m/%d/%Y",))
+        rows.append({
+            "activity_id": activity_id,
+            "requested": _parse_grid_date(text[columns["requested"]], ELAB_GRID_DATETIME_FORMATS),
+            "ready": "gold" not in cells[ELAB_GRID_COL_STATUS]["style"].lower(),
+            "type": text[columns["type"]],
+            "model": text[columns["model"]],
+            "date_filter": date_filter.date() if date_filter else None,
+        })
+    return rows, []
+
+
+def _finished_elaborations(grid_rows, report_id, models, date_filter):
+    """
+    {activity_id: (model_name, requested timestamp)} of the newest finished elaboration of each model
+    with the same report type and date filter, requested less than ELABORATION_REUSE_MAX_AGE_HOURS ago.
+    """
+    wanted_date = _parse_grid_date(date_filter, ("%m/%d/%Y",)).date()
+    names_by_text = {model_text.strip(): model_name for model_name, model_text in models}
+    cutoff = datetime.now() - timedelta(hours=ELABORATION_REUSE_MAX_AGE_HOURS)
+    newest = {}
+    for row in grid_rows:
+        model_name = names_by_text.get(row["model"])
+        if (model_name is None or not row["ready"] or not re.search(rf"\b{report_id}\b", row["type"]) or row["date_filter"] != wanted_date
+                or row["requested"] is None or row["requested"] < cutoff):
+            continue
+        if model_name not in newest or row["requested"] > newest[model_name]["requested"]:
+            newest[model_name] = row
+    return {row["activity_id"]: (model_name, row["requested"].timestamp()) for model_name, row in newest.items()}
+
+
+def _find_ready_activities(driver, activity_ids):
+    """
+    Returns the activity IDs whose row in dgElaborationRequests is no longer pending (gold).
+    Rows are located by activity ID, not by position, because other chunks and reports
+    elaborating at the same time share the same grid.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import StaleElementReferenceException
+    ready = set()
+    for activity_id in activity_ids:
+        try:
+            rows = driver.find_elements(By.XPATH, f"//table[@id='dgElaborationRequests']//tr[contains(., '{activity_id}')]")
+            if not rows:
                 continue
+            status_cells = rows[0].find_elements(By.XPATH, f"./td[{ELAB_GRID_COL_STATUS + 1}]")
+            if status_cells and "gold" not in (status_cells[0].get_attribute("style") or "").lower():
+                ready.add(activity_id)
+        except StaleElementReferenceException:
+            pass
+    return ready
 
-            wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "#MainContent_lblMessage > a.actlink"))).click()
-            num_reports_in_chunk = len(activity_to_model_map)
-            print(f"[{thread_name}] On results page. Waiting for {num_reports_in_chunk} reports to finish...")
-            
-            max_wait_minutes = 15
-            start_time = time.time()
-            while True:
-                if time.time() - start_time > max_wait_minutes * 60:
-                    print(f"[{thread_name}] ERROR: Waited >{max_wait_minutes} mins. Proceeding with what is available.")
-                    break
-                ready_reports_count = 0
-                try:
-                    wait.until(EC.presence_of_element_located((By.XPATH, f"//tr[.//a[@id='dgElaborationRequests_cmdListFiles_{num_reports_in_chunk - 1}']]")))
-                    activity_cells = driver.find_elements(By.XPATH, f"//tr[.//a[starts-with(@id, 'dgElaborationRequests_cmdListFiles_')]][position() <= {num_reports_in_chunk}]/td[4]")
-                    for cell in activity_cells:
-                        if "gold" not in (cell.get_attribute("style") or "").lower():
-                            ready_reports_count += 1
-                    if ready_reports_count >= num_reports_in_chunk:
-                        print(f"[{thread_name}] ✅ All {num_reports_in_chunk} reports for this chunk are ready.")
-                        break
-                except TimeoutException: pass
-                try:
-                    wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Apply Filter']"))).click()
-                except Exception: driver.refresh()
-                time.sleep(5)
 
-            print(f"[{thread_name}] Starting download process...")
-            for activity_id, model_name_for_download in activity_to_model_map.items():
-                try:
-                    print(f"[{thread_name}] Locating report for model '{model_name_for_download}' (Activity ID: {activity_id})")
-                    
-                    row_xpath = f"//table[@id='dgElaborationRequests']//tr[contains(., '{activity_id}')]"
-                    report_row = wait.until(EC.presence_of_element_located((By.XPATH, row_xpath)))
+class ElaborationHistory(JsonStore):
+    """
+    Elaboration durations observed in past runs, per report type and model.
+    Persisted as JSON next to the reports and shared by every chunk thread of the run.
+    """
+    label = "elaboration history"
+
+    def expected_seconds(self, report_id, model_name):
+        """Median of the recent durations, or ELABORATION_DEFAULT_SECONDS without history."""
+        with self._lock:
+            durations = sorted(self.data.get(report_id, {}).get(model_name, []))
+        if not durations:
+            return ELABORATION_DEFAULT_SECONDS
+        return durations[len(durations) // 2]
+
+    def record(self, report_id, model_name, seconds):
+        with self._lock:
+            durations = self.data.setdefault(report_id, {}).setdefault(model_name, [])
+            durations.append(round(seconds, 1))
+            del durations[:-ELABORATION_HISTORY_SIZE]
+            self._save()
+
+
+def _format_seconds(seconds):
+    seconds = max(0, int(seconds))
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def _wait_for_chunk(driver, wait, report_id, activity_to_model_map, submitted_at, history, thread_name, resumed_at=None):
+    """
+    Polls dgElaborationRequests until every activity of the chunk is ready or has timed out.
+    After the first check, polls are scheduled for the earliest expected completion (from past runs);
+    once a model is overdue the poll interval backs off from POLL_MIN_SECONDS to
+    POLL_MAX_SECONDS. Each model has its own timeout derived from its expected duration.
+    Activities resumed from an earlier run (`resumed_at` set) time out counting from the resume,
+    and their durations are not recorded since they include the interruption.
+    Returns the {activity_id: model_name} map of the reports that are ready for download.
+    """
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException
+    pending = {}
+    for activity_id, model_name in activity_to_model_map.items():
+        expected = history.expected_seconds(report_id, model_name)
+        timeout = min(max(expected * MODEL_TIMEOUT_FACTOR, MODEL_TIMEOUT_MIN_SECONDS), MODEL_TIMEOUT_MAX_SECONDS)
+        timeout_start = max(submitted_at[activity_id], resumed_at or 0)
+        pending[activity_id] = (submitted_at[activity_id] + expected, timeout_start + timeout)
+    print(f"[{thread_name}] On results page. Waiting for {len(pending)} reports to finish...")
+
+    ready_map = {}
+    overdue_interval = POLL_MIN_SECONDS
+    while True:
+        try:
+            wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+            now = time.time()
+            for activity_id in _find_ready_activities(driver, list(pending)):
+                model_name = activity_to_model_map[activity_id]
+                elapsed = now - submitted_at[activity_id]
+                if resumed_at is None:
+                    history.record(report_id, model_name, elapsed)
+                tracer.record("model.elaboration", submitted_at[activity_id], now, model=model_name, activity_id=activity_id)
+                ready_map[activity_id] = model_name
+                del pending[activity_id]
+                print(f"[{thread_name}] ✅ '{model_name}' ready after {_format_seconds(elapsed)}.")
+        except TimeoutException: pass
+
+        now = time.time()
+        for activity_id, (eta, deadline) in list(pending.items()):
+            if now > deadline:
+                print(f"[{thread_name}] ERROR: '{activity_to_model_map[activity_id]}' not ready after {_format_seconds(now - submitted_at[activity_id])}. Giving up on it.")
+                tracer.record("model.elaboration", submitted_at[activity_id], now, model=activity_to_model_map[activity_id],
+                              activity_id=activity_id, error="timeout")
+                del pending[activity_id]
+        if not pending:
+            break
+
+        next_eta = min(eta for eta, _ in pending.values())
+        next_deadline = min(deadline for _, deadline in pending.values())
+        if now < next_eta:
+            delay = next_eta - now
+        else:
+            delay = overdue_interval
+            overdue_interval = min(overdue_interval * POLL_BACKOFF_FACTOR, POLL_MAX_SECONDS)
+        delay = min(max(delay, POLL_MIN_SECONDS), POLL_MAX_SECONDS, max(next_deadline - now, 0) + 1)
+        last_eta = max(eta for eta, _ in pending.values())
+        eta_text = f"ETA ~{_format_seconds(last_eta - now)}" if last_eta > now else "past expected time"
+        print(f"[{thread_name}] ⏳ {len(pending)} pending, {eta_text}. Next check in {delay:.0f}s.")
+        time.sleep(delay)
+        try:
+            wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Apply Filter']"))).click()
+        except Exception: driver.refresh()
 
-                    list_files_link = report_row.find_element(By.XPATH, ".//a[starts-with(@id, 'dgElaborationRequests_cmdListFiles_')]")
-                    
-                    for f in os.listdir(temp_download_path): os.remove(os.path.join(temp_download_path, f))
-                    list_files_link.click()
+    print(f"[{thread_name}] {len(ready_map)}/{len(activity_to_model_map)} reports for this chunk are ready.")
+    return ready_map
 
+
+def _download_chunk(session, wait, activity_to_model_map, modelos_folder_path, thread_name, on_file_saved=None):
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    driver = session.driver
+    print(f"[{thread_name}] Starting download process...")
+    for activity_id, model_name_for_download in activity_to_model_map.items():
+        try:
+            print(f"[{thread_name}] Locating report for model '{model_name_for_download}' (Activity ID: {activity_id})")
+
+            row_xpath = f"//table[@id='dgElaborationRequests']//tr[contains(., '{activity_id}')]"
+            report_row = wait.until(EC.presence_of_element_located((By.XPATH, row_xpath)))
+
+            list_files_link = report_row.find_element(By.XPATH, ".//a[starts-with(@id, 'dgElaborationRequests_cmdListFiles_')]")
+
+            session.clear_downloads()
+            with tracer.span("model.download", model=model_name_for_download, activity_id=activity_id, backend="browser") as span:
+                list_files_link.click()
+                with DownloadWatcher(session.download_path) as watcher:
                     wait.until(EC.element_to_be_clickable((By.ID, "dgFiles_hlkDownloadFile_0"))).click()
-                    newly_downloaded_path = wait_and_get_downloaded_file(temp_download_path, 120)
-                    
-                    if newly_downloaded_path:
-                        final_filename = f"{model_name_for_download}{os.path.splitext(newly_downloaded_path)[1]}"
-                        # Using the correct subfolder for Report 29
-                        modelos_folder_path = os.path.join(reports_path, MODELS_SUBFOLDER_NAME_29)
-                        os.makedirs(modelos_folder_path, exist_ok=True)
-                        shutil.move(newly_downloaded_path, os.path.join(modelos_folder_path, final_filename))
-                        print(f"[{thread_name}] -> 💾 File successfully saved as: {final_filename}")
-                    else:
-                        print(f"[{thread_name}] -> ⚠️ WARNING: Download timed out for model '{model_name_for_download}'.")
-                    
-                    driver.back()
-                    wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
-                
-                except Exception as e:
-                    print(f"[{thread_name}] -> ❌ ERROR processing report for '{model_name_for_download}': {e}. Attempting to recover.")
-                    driver.get(driver.current_url)
-                    wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+                    newly_downloaded_path = watcher.wait(120)
+                if newly_downloaded_path:
+                    span.set(bytes=os.path.getsize(newly_downloaded_path))
+                else:
+                    span.set(error="timeout")
+
+            if newly_downloaded_path:
+                final_filename = f"{model_name_for_download}{os.path.splitext(newly_downloaded_path)[1]}"
+                os.makedirs(modelos_folder_path, exist_ok=True)
+                final_path = os.path.join(modelos_folder_path, final_filename)
+                with tracer.span("model.move", model=model_name_for_download):
+                    shutil.move(newly_downloaded_path, final_path)
+                print(f"[{thread_name}] -> 💾 File successfully saved as: {final_filename} (downloaded in {watcher.elapsed:.1f}s)")
+                if on_file_saved:
+                    on_file_saved(model_name_for_download, final_path)
+            else:
+                print(f"[{thread_name}] -> ⚠️ WARNING: Download timed out for model '{model_name_for_download}'.")
+
+            driver.back()
+            wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+
+        except Exception as e:
+            print(f"[{thread_name}] -> ❌ ERROR processing report for '{model_name_for_download}': {e}. Attempting to recover.")
+            driver.get(driver.current_url)
+            wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+
+
+def _process_chunk(report_id, chunk_label, current_chunk, session_pool, reports_path, credentials, thread_name, on_file_saved=None,
+                   journal=None, resumed=None, results_address=None):
+    """
+    Submits, waits for and downloads one chunk of models on a leased Edge session.
+    `on_file_saved(model_name, path)` is called for every model file saved to disk.
+    Each submission is written to `journal`. A chunk `resumed` from the journal
+    ({activity_id: (model_name, submitted_at)}) skips the submission and goes straight to
+    the results page at `results_address`.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    report_config = ELABORATION_REPORTS[report_id]
+    authenticated_url = build_authenticated_url(report_config["url"], credentials)
+    modelos_folder_path = os.path.join(reports_path, report_config["subfolder"])
+    print(f"\n[{thread_name}] --- Processing Chunk {chunk_label} ---")
+    try:
+        with tracer.span("chunk", report=report_id, chunk=chunk_label, models=len(current_chunk)), session_pool.lease() as session:
+            driver = session.driver
+            wait = WebDriverWait(driver, 60)
+            resumed_at = None
+            if resumed:
+                resumed_at = time.time()
+                driver.get(build_authenticated_url(results_address, credentials))
+                activity_to_model_map = {activity_id: model_name for activity_id, (model_name, _) in resumed.items()}
+                submitted_at = {activity_id: submitted for activity_id, (_, submitted) in resumed.items()}
+            else:
+                on_submitted = None
+                if journal:
+                    date_filter = _elaboration_date_filter()
+                    def on_submitted(activity_id, model_name, submitted, results_address):
+                        journal.record_submitted(report_id, activity_id, model_name, submitted, date_filter, results_address)
+                activity_to_model_map, submitted_at = _submit_chunk(driver, wait, authenticated_url, current_chunk, thread_name, on_submitted)
+            if not activity_to_model_map:
+                print(f"[{thread_name}] No models in chunk {chunk_label} successfully submitted. Skipping chunk.")
+                return
+            history = ElaborationHistory.for_path(os.path.join(reports_path, ELABORATION_HISTORY_FILE))
+            activity_to_model_map = _wait_for_chunk(driver, wait, report_id, activity_to_model_map, submitted_at, history, thread_name, resumed_at)
+            if not activity_to_model_map:
+                return
+            if DOWNLOAD_BACKEND == "http":
+                print(f"[{thread_name}] Starting HTTP download process...")
+                fetcher = PortalHttpFetcher.from_driver(driver, credentials)
+                # Anything the HTTP backend could not fetch falls back to the browser flow
+                activity_to_model_map = fetcher.fetch_chunk(driver.current_url, activity_to_model_map, modelos_folder_path, thread_name, on_file_saved)
+            if activity_to_model_map:
+                _download_chunk(session, wait, activity_to_model_map, modelos_folder_path, thread_name, on_file_saved)
+    except Exception as e:
+        print(f"\n[{thread_name}] ❌ ERROR in chunk {chunk_label} of Report {report_id}: {e}")
+
 
+def _lookup_elaborations(report_id, jobs, models, date_filter, session_pool, credentials, journal, thread_name):
+    """
+    Reads dgElaborationRequests once before anything is submitted and returns the
+    {activity_id: (model_name, submitted_at)} elaborations to download instead of submitting:
+    finished elaborations of the same model, report type and date filter (see _finished_elaborations,
+    only with REUSE_FINISHED_ELABORATIONS), then the journaled activities of an interrupted earlier
+    run that are still listed. Journaled activities no longer listed are marked "missing" so their
+    models are submitted again. The grid is opened at the results page the portal linked to on the
+    newest journaled submission; without one (or without anything to look up) it is not read at all.
+    Returns (finished, resumed, results_address).
+    """
+    results_address = journal.results_address(report_id)
+    if not results_address or (not jobs and not REUSE_FINISHED_ELABORATIONS):
+        if jobs:
+            print(f"[{thread_name}] No results page recorded for the earlier elaborations. Submitting them again.")
+        return {}, {}, None
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    try:
+        with tracer.span("elaboration.lookup", report=report_id, activities=len(jobs)), session_pool.lease() as session:
+            driver = session.driver
+            driver.get(build_authenticated_url(results_address, credentials))
+            WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+            page = _PortalPageParser()
+            page.feed(driver.page_source)
     except Exception as e:
-        print(f"\n[{thread_name}] ❌ FATAL ERROR during Report 29 processing: {e}")
-    finally:
-        print(f"[{thread_name}] Process finished. Closing browser.")
-        driver.quit()
-        if os.path.exists(temp_download_path):
-            shutil.rmtree(temp_download_path)
-    print(f"--- [{thread_name}] ✅ Special process for Report 29 completed. ---")
+        print(f"[{thread_name}] WARNING: Could not read the elaboration requests, submitting every model. {e}")
+        return {}, {}, None
+
+    finished = {}
+    if REUSE_FINISHED_ELABORATIONS:
+        grid_rows, missing_headers = _elaboration_grid(page)
+        if missing_headers:
+            print(f"[{thread_name}] WARNING: dgElaborationRequests has no {', '.join(missing_headers)} column. "
+                  f"Not looking for finished elaborations (see ELAB_GRID_HEADERS).")
+        elif grid_rows and all(row["requested"] is None for row in grid_rows):
+            print(f"[{thread_name}] WARNING: Could not read the request times in dgElaborationRequests "
+                  f"(see ELAB_GRID_DATETIME_FORMATS). Not looking for finished elaborations.")
+        else:
+            finished = _finished_elaborations(grid_rows, report_id, models, date_filter)
+    finished_models = {model_name for model_name, _ in finished.values()}
+    # Rows are matched by the activity ID anywhere in their text, as _find_ready_activities does
+    row_texts = ["".join(row["text"]) for row in page.grid_rows]
+    listed = {activity_id for activity_id in jobs if any(activity_id in text for text in row_texts)}
+    missing = [activity_id for activity_id in jobs if activity_id not in listed]
+    if missing:
+        print(f"[{thread_name}] {len(missing)} earlier elaborations are no longer listed and will be submitted again.")
+        journal.mark(report_id, missing, "missing")
+    resumed = {activity_id: job for activity_id, job in jobs.items() if activity_id in listed and job[0] not in finished_models}
+    return finished, resumed, results_address
+
+
+def process_elaboration_report(report_id, session_pool, reports_path, credentials, base_path, on_model_file=None):
+    """
+    Generates and downloads an elaborated report (29 or 61) for every model in Modelos.json.
+    With MAX_CONCURRENT_CHUNKS > 1 the chunks run in parallel on separate Edge sessions,
+    so the total wait follows the slowest chunk instead of the sum of all chunks.
+    `on_model_file(model_name, path)` is called as soon as each model file is downloaded.
+    Finished elaborations of the same model and date filter, and those submitted by an interrupted
+    earlier run (see JobJournal), are downloaded instead of resubmitted.
+    Returns the names of the models left without a file this run ([] when all succeeded),
+    or None when Modelos.json could not be loaded.
+    """
+    thread_name = f"Report-{report_id}"
+    print(f"\n--- [{thread_name}] Starting special process for Report {report_id} ---")
+    all_models_list = _load_models(base_path, thread_name)
+    if all_models_list is None:
+        return None
+
+    # Skip models whose file from an earlier run is still fresh
+    modelos_folder_path = os.path.join(reports_path, ELABORATION_REPORTS[report_id]["subfolder"])
+    date_filter = _elaboration_date_filter()
+    manifest = RunManifest.for_path(os.path.join(reports_path, RUN_MANIFEST_FILE))
+    fresh_models = [name for name, _ in all_models_list if manifest.is_fresh(report_id, name, modelos_folder_path, date_filter)]
+    if fresh_models:
+        print(f"[{thread_name}] ♻️ Reusing fresh files for {len(fresh_models)} models: {', '.join(fresh_models)}")
+    models_to_submit = [(name, text) for name, text in all_models_list if name not in fresh_models]
+    if not models_to_submit:
+        print(f"--- [{thread_name}] ✅ All Report {report_id} files are fresh. Nothing to elaborate. ---")
+        return []
+    models_needed = [name for name, _ in models_to_submit]
+    saved_models = set()
+
+    # Download finished elaborations of the same model and date filter, and resume those an
+    # interrupted earlier run submitted but never downloaded, instead of submitting them again
+    journal = JobJournal.for_path(os.path.join(reports_path, JOB_JOURNAL_FILE))
+    jobs = journal.pending(report_id, date_filter, {name for name, _ in models_to_submit})
+    finished, resumed_jobs, results_address = _lookup_elaborations(report_id, jobs, models_to_submit, date_filter, session_pool, credentials, journal, thread_name)
+    if finished:
+        print(f"[{thread_name}] ♻️ Downloading {len(finished)} finished elaborations instead of submitting them: "
+              f"{', '.join(model_name for model_name, _ in finished.values())}")
+    if resumed_jobs:
+        print(f"[{thread_name}] 🔁 Resuming {len(resumed_jobs)} elaborations from an earlier run: "
+              f"{', '.join(model_name for model_name, _ in resumed_jobs.values())}")
+    model_texts = dict(models_to_submit)
+    resumed_items = list(finished.items()) + list(resumed_jobs.items())
+    resumed_chunks = [dict(resumed_items[i:i + CHUNK_SIZE]) for i in range(0, len(resumed_items), CHUNK_SIZE)]
+    resumed_models = {model_name for _, (model_name, _) in resumed_items}
+    models_to_submit = [(name, text) for name, text in models_to_submit if name not in resumed_models]
+
+    def on_file_saved(model_name, path):
+        saved_models.add(model_name)
+        manifest.record(report_id, model_name, path, date_filter)
+        journal.mark_model_downloaded(report_id, model_name)
+        if on_model_file:
+            on_model_file(model_name, path)
+
+    # (models, resumed activities) per chunk; resumed chunks go first, their elaborations are the furthest along
+    model_chunks = [([(model_name, model_texts[model_name]) for model_name, _ in chunk.values()], chunk) for chunk in resumed_chunks]
+    model_chunks += [(models_to_submit[i:i + CHUNK_SIZE], None) for i in range(0, len(models_to_submit), CHUNK_SIZE)]
+    print(f"[{thread_name}] Submitting {len(models_to_submit)} of {len(all_models_list)} models, split into {len(model_chunks)} chunks.")
+
+    max_workers = max(1, min(MAX_CONCURRENT_CHUNKS, len(model_chunks)))
+    try:
+        if max_workers == 1:
+            for chunk_index, (current_chunk, resumed) in enumerate(model_chunks):
+                chunk_label = f"{chunk_index + 1}/{len(model_chunks)}"
+                _process_chunk(report_id, chunk_label, current_chunk, session_pool, reports_path, credentials, thread_name, on_file_saved,
+                               journal, resumed, results_address)
+        else:
+            print(f"[{thread_name}] Running {len(model_chunks)} chunks with up to {max_workers} in parallel.")
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name) as executor:
+                futures = [
+                    traced_submit(executor, _process_chunk, report_id, f"{chunk_index + 1}/{len(model_chunks)}", current_chunk,
+                                    session_pool, reports_path, credentials, f"{thread_name}-C{chunk_index + 1}", on_file_saved,
+                                    journal, resumed, results_address)
+                    for chunk_index, (current_chunk, resumed) in enumerate(model_chunks)
+                ]
+                for future in futures:
+                    future.result()
+    except Exception as e:
+        print(f"\n[{thread_name}] ❌ FATAL ERROR during Report {report_id} processing: {e}")
+    failed_models = [name for name in models_needed if name not in saved_models]
+    if failed_models:
+        print(f"--- [{thread_name}] ⚠️ Report {report_id} finished without files for {len(failed_models)} models: {', '.join(failed_models)} ---")
+    else:
+        print(f"--- [{thread_name}] ✅ Special process for Report {report_id} completed. ---")
+    return failed_models
+
+
+def process_report_29(new_filename_base, session_pool, reports_path, credentials, base_path, on_file_saved=None):
+    """
+    Handles the special multi-step generation and download for Report 29.
+    Uses the same stable logic as process_report_61.
+    """
+    return process_elaboration_report("29", session_pool, reports_path, credentials, base_path, on_file_saved)
+
+
+# ====================================================================================
+# --- REPORT SCHEMAS ---
+# ====================================================================================
+
+def _as_text(series):
+    if series.dtype == object:
+        return series
+    text = series.astype(str)
+    if pd.api.types.is_float_dtype(series):
+        text = text.str.replace(r'\.0$', '', regex=True)
+    return text.where(series.notna())
+
+
+def _numeric_categories(series):
+    """Categories that are all numbers (model codes, element types) become numbers."""
+    numbers = pd.to_numeric(series.cat.categories, errors='coerce')
+    if len(numbers) == 0 or numbers.isna().any() or numbers.duplicated().any():
+        return series
+    if (numbers % 1 == 0).all():
+        numbers = pd.to_numeric(numbers, downcast='integer')
+    return series.cat.rename_categories(numbers)
+
+
+def _cast_column(series, dtype, categories=True):
+    """
+    Casts one column to its schema dtype. Category columns holding only numbers get numeric
+    categories. With categories=False they are left as plain values, for frames that are
+    still going to be concatenated (differing categories would fall back to object).
+    Integer columns that do not fit the declared type, or have missing values, stay as
+    the nearest wider numeric type instead of wrapping around.
+    """
+    if dtype == "str":
+        return _as_text(series)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if dtype == "category":
+            return series
+        series = series.astype(object)
+    if dtype == "category":
+        if series.dtype == object:
+            return _numeric_categories(series.astype("category")) if categories else series
+        if pd.api.types.is_float_dtype(series) and not series.hasnans and (series % 1 == 0).all():
+            series = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast='integer')
+        return series.astype("category") if categories else series
+    numeric = pd.to_numeric(series, errors='coerce')
+    if dtype.startswith("float"):
+        return numeric.astype(dtype)
+    if numeric.dtype == dtype:
+        return numeric
+    limits = np.iinfo(dtype)
+    present = numeric.dropna()
+    if len(present) == len(numeric) and present.between(limits.min, limits.max).all() and (present % 1 == 0).all():
+        return numeric.astype(dtype)
+    return numeric
+
+
+def apply_schema(df, report_id, categories=True):
+    """
+    Applies REPORT_SCHEMAS[report_id] to a freshly loaded frame: casts the declared columns
+    present (under their original or renamed name), drops rows missing a required column
+    and renames. Undeclared columns are left as they are. Returns the resulting frame.
+    """
+    schema = REPORT_SCHEMAS[report_id]
+    renames = schema["renames"]
+    for column, dtype in schema["dtypes"].items():
+        name = column if column in df.columns else renames.get(column)
+        if name in df.columns:
+            df[name] = _cast_column(df[name], dtype, categories)
+    for column in schema.get("required", []):
+        name = column if column in df.columns else renames.get(column)
+        if name in df.columns and df[name].isna().any():
+            df = df[df[name].notna()]
+    return df.rename(columns=renames)
+
+
+def schema_read_dtypes(report_id):
+    """dtype= for read_csv/read_excel: the schema's text columns, under both names, read as text."""
+    schema = REPORT_SCHEMAS[report_id]
+    text_columns = [column for column, dtype in schema["dtypes"].items() if dtype == "str"]
+    return {name: str for column in text_columns for name in (column, schema["renames"].get(column, column))}
+
+
+def exact_float64(series):
+    """
+    A weight column as float64. float32 values come back as the decimal they were read
+    from (17.19, not 17.190000534...), so they compare and export like the original.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.dtype == np.float32:
+        numeric = numeric.astype(str).astype('float64')
+    return numeric
+
+
+# ====================================================================================
+# --- COLUMNAR INTERMEDIATE STORE ---
+# ====================================================================================
+
+def intermediate_path(reports_path, name):
+    return os.path.join(reports_path, INTERMEDIATE_FOLDER_NAME, f"{name}.parquet")
+
+
+def _arrow_safe(df):
+    """Object columns mixing numbers and text (common after concatenating CSVs) are stored as text."""
+    for column in df.columns[df.dtypes == object]:
+        inferred = pd.api.types.infer_dtype(df[column], skipna=True)
+        if inferred not in ("string", "empty", "bytes"):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+def write_intermediate(df, reports_path, name):
+    path = intermediate_path(reports_path, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _arrow_safe(df.copy()).to_parquet(path, index=False, compression=INTERMEDIATE_COMPRESSION)
+    return path
+
+
+def read_intermediate(reports_path, name, columns=None):
+    return pd.read_parquet(intermediate_path(reports_path, name), columns=columns)
+
+
+def remove_intermediate(reports_path, name):
+    path = intermediate_path(reports_path, name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class IntermediateWriter:
+    """
+    Appends DataFrame chunks to a Parquet intermediate file, one row group per chunk.
+    The file is written under a temporary name and only published by commit().
+    """
+    def __init__(self, reports_path, name):
+        self.path = intermediate_path(reports_path, name)
+        self.temp_path = self.path + ".tmp"
+        self.rows = 0
+        self._writer = None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def write(self, df):
+        self.write_table(pa.Table.from_pandas(_arrow_safe(df.copy()), preserve_index=False))
+
+    def write_table(self, table):
+        import pyarrow.parquet as pq
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.temp_path, table.schema, compression=INTERMEDIATE_COMPRESSION)
+        elif table.schema != self._writer.schema:
+            # Align to the first chunk's columns: missing columns become nulls, extra ones are dropped
+            schema = self._writer.schema
+            table = pa.Table.from_arrays([
+                table.column(field.name).cast(field.type) if field.name in table.column_names else pa.nulls(len(table), field.type)
+                for field in schema
+            ], schema=schema)
+        self._writer.write_table(table)
+        self.rows += len(table)
+
+    def commit(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        os.replace(self.temp_path, self.path)
+
+
+def load_report_table(reports_path, name, excel_name, report_id):
+    """Loads a stage output from the columnar store, falling back to its Excel export, with its schema applied."""
+    if os.path.exists(intermediate_path(reports_path, name)):
+        return apply_schema(read_intermediate(reports_path, name), report_id)
+    return apply_schema(pd.read_excel(os.path.join(reports_path, excel_name), dtype=schema_read_dtypes(report_id)), report_id)
+
+
+_pfep_memo = {}
+_pfep_memo_lock = threading.Lock()
+
+
+def _pfep_signature(pfep_path):
+    stat = os.stat(pfep_path)
+    return {"mtime_ns": str(stat.st_mtime_ns), "size": str(stat.st_size)}
+
+
+def _read_pfep_sidecar(sidecar_path, signature):
+    """Returns the cached PFEP columns if the sidecar was built from this exact workbook, else None."""
+    import pyarrow.parquet as pq
+    if not os.path.exists(sidecar_path):
+        return None
+    try:
+        metadata = pq.read_schema(sidecar_path).metadata or {}
+        stored = {key: metadata.get(f"pfep_{key}".encode(), b"").decode() for key in signature}
+        if stored != signature:
+            return None
+        return apply_schema(pd.read_parquet(sidecar_path), "pfep")
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"⚠️ Could not read PFEP cache {os.path.basename(sidecar_path)}: {e}")
+        return None
+
+
+@traced()
+def load_pfep(pfep_path):
+    """
+    Loads the PFEP workbook columns used by the pipeline (PFEP_COLUMNS), with the "pfep" schema.
+    The parsed columns are saved to a Parquet sidecar keyed by the workbook's mtime and size,
+    and kept in memory, so the workbook is only parsed again after it changes.
+    Callers get their own copy of the data.
+    """
+    import pyarrow.parquet as pq
+    signature = _pfep_signature(pfep_path)
+    sidecar_path = intermediate_path(os.path.dirname(pfep_path), PFEP_STORE)
+    with _pfep_memo_lock:
+        cached = _pfep_memo.get(pfep_path)
+        if cached is None or cached[0] != signature:
+            pfep_df = _read_pfep_sidecar(sidecar_path, signature)
+            if pfep_df is None:
+                print(f"Parsing {os.path.basename(pfep_path)}...")
+                pfep_df = apply_schema(pd.read_excel(pfep_path, dtype=str, header=PFEP_HEADER_ROW, usecols=PFEP_COLUMNS), "pfep")
+                table = pa.Table.from_pandas(pfep_df, preserve_index=False)
+                metadata = dict(table.schema.metadata or {})
+                metadata.update({f"pfep_{key}".encode(): value.encode() for key, value in signature.items()})
+                os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+                pq.write_table(table.replace_schema_metadata(metadata), sidecar_path, compression=INTERMEDIATE_COMPRESSION)
+            else:
+                print(f"Loaded {os.path.basename(pfep_path)} from cache.")
+            cached = (signature, pfep_df)
+            _pfep_memo[pfep_path] = cached
+        return cached[1].copy()
+
+
+# ====================================================================================
+# --- STREAMING EXCEL EXPORT ---
+# ====================================================================================
+
+def _excel_column_values(series):
+    """Converts one column block to plain Python values, with None for missing cells."""
+    if series.dtype == np.float32:
+        series = exact_float64(series)
+    values = series.tolist()
+    if series.hasnans:
+        missing = series.isna().to_numpy()
+        values = [None if is_missing else value for value, is_missing in zip(values, missing)]
+    return values
+
+
+def _excel_parts(df, max_rows):
+    if len(df) <= max_rows:
+        return [df]
+    return [df.iloc[start:start + max_rows] for start in range(0, len(df), max_rows)]
+
+
+def _split_name(name, part_index, max_length=None):
+    suffix = f" ({part_index + 1})" if part_index else ""
+    if max_length:
+        name = name[:max_length - len(suffix)]
+    return f"{name}{suffix}"
+
+
+def _write_excel_sheet(workbook, sheet_name, df, formats):
+    worksheet = workbook.add_worksheet(sheet_name)
+    columns = [str(c) for c in df.columns]
+    # One format per column instead of per cell
+    for index, column in enumerate(columns):
+        series = df.iloc[:, index]
+        if pd.api.types.is_integer_dtype(series):
+            cell_format = formats["int"]
+        elif pd.api.types.is_float_dtype(series):
+            cell_format = formats["float"]
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            cell_format = formats["date"]
+        else:
+            cell_format = None
+        worksheet.set_column(index, index, min(max(len(column) + 2, 10), 50), cell_format)
+    worksheet.write_row(0, 0, columns, formats["header"])
+    # constant_memory mode flushes each row as soon as the next one starts
+    row_index = 1
+    for start in range(0, len(df), EXCEL_WRITE_BLOCK_ROWS):
+        block = df.iloc[start:start + EXCEL_WRITE_BLOCK_ROWS]
+        column_values = [_excel_column_values(block.iloc[:, i]) for i in range(block.shape[1])]
+        for row in zip(*column_values):
+            worksheet.write_row(row_index, 0, row)
+            row_index += 1
+
+
+@traced()
+def export_excel(path, sheets, split_mode=EXCEL_SPLIT_MODE):
+    """
+    Writes {sheet_name: DataFrame} to an .xlsx file with xlsxwriter in constant-memory mode.
+    Tables longer than Excel's row limit are split into extra sheets ('Name (2)', ...) or,
+    with split_mode="files", into extra workbooks ('File (2).xlsx', ...).
+    Returns the list of files written.
+    """
+    max_data_rows = EXCEL_MAX_ROWS - 1  # Header row
+    if split_mode == "files":
+        sheet_parts = {name: _excel_parts(df, max_data_rows) for name, df in sheets.items()}
+        file_count = max(len(parts) for parts in sheet_parts.values())
+        stem, extension = os.path.splitext(path)
+        targets = []
+        for i in range(file_count):
+            workbook_sheets = {name: parts[i] for name, parts in sheet_parts.items() if i < len(parts)}
+            targets.append((f"{_split_name(stem, i)}{extension}", workbook_sheets))
+    else:
+        workbook_sheets = {}
+        for name, df in sheets.items():
+            for i, part in enumerate(_excel_parts(df, max_data_rows)):
+                workbook_sheets[_split_name(name, i, max_length=31)] = part
+        targets = [(path, workbook_sheets)]
+
+    for target, workbook_sheets in targets:
+        workbook = xlsxwriter.Workbook(target, {
+            'constant_memory': True,
+            'strings_to_numbers': False,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'default_date_format': 'dd/mm/yyyy hh:mm:ss',
+            'remove_timezone': True,
+        })
+        formats = {
+            "header": workbook.add_format({'bold': True}),
+            "int": workbook.add_format({'num_format': '0'}),
+            "float": workbook.add_format({'num_format': 'General'}),
+            "date": workbook.add_format({'num_format': 'dd/mm/yyyy hh:mm:ss'}),
+        }
+        try:
+            for sheet_name, df in workbook_sheets.items():
+                _write_excel_sheet(workbook, sheet_name, df, formats)
+        finally:
+            workbook.close()
+    return [target for target, _ in targets]
+
+
+def _parse_model_file_29(file_path, model_code):
+    """Process-pool worker: one Report 29 model file, tagged with its model, as Arrow IPC."""
+    return _to_ipc_bytes(_read_model_file_29(file_path, model_code))
+
+
+def _read_model_file_29(file_path, model_code):
+    df = pd.read_csv(file_path, delimiter=',', encoding='utf-16', dtype=schema_read_dtypes("29"), low_memory=False)
+    df['Model'] = model_code
+    return apply_schema(df, "29", categories=False)
 
 
-def merge_models_29(reports_path, base_path):
-    """Merges all individual Report 29 CSV files into a single master CSV."""
+def _merge_modes(file_count):
+    """Merge paths to run: the configured one, plus the serial one when timing a comparison."""
+    if MERGE_WORKERS > 1 and file_count > 1:
+        return ["serial", "parallel"] if MERGE_COMPARE_SERIAL else ["parallel"]
+    return ["serial"]
+
+
+def _print_merge_timings(label, file_count, timings):
+    if "parallel" in timings and "serial" in timings:
+        speedup = timings["serial"] / timings["parallel"] if timings["parallel"] else float("inf")
+        print(f"⏱️ {label} merge of {file_count} files: serial {timings['serial']:.1f}s, "
+              f"{MERGE_WORKERS} workers {timings['parallel']:.1f}s ({speedup:.1f}x)")
+    else:
+        for mode, seconds in timings.items():
+            workers = f"{MERGE_WORKERS} workers" if mode == "parallel" else "serial"
+            print(f"⏱️ {label} merge of {file_count} files ({workers}): {seconds:.1f}s")
+
+
+@traced()
+def merge_models_29(reports_path, base_path, ingested=None):
+    """
+    Merges all individual Report 29 CSV files into the 'merged_29' intermediate file.
+    `ingested` maps model files already parsed during the download (ModelIngestor) to their results.
+    """
     print("\n--- Starting Report 29 Model File Merge Process ---")
     modelos_folder_path = os.path.join(reports_path, MODELS_SUBFOLDER_NAME_29)
     try:
@@ -341,197 +2115,196 @@ def merge_models_29(reports_path, base_path):
     except Exception as e:
         print(f"ERROR: Could not load {JSON_MODELS_FILE}. Reason: {e}")
         return
-    csv_files = glob.glob(os.path.join(modelos_folder_path, "*.csv"))
+    csv_files = sorted(glob.glob(os.path.join(modelos_folder_path, "*.csv")))
     if not csv_files:
         print("No Report 29 model CSV files found to merge.")
         return
-    df_list = []
-    for file in csv_files:
-        try:
-            model_name = os.path.splitext(os.path.basename(file))[0]
-            model_text = models_data.get(model_name)
-            model_code = model_text.split()[0] if model_text else "UNKNOWN"
-            df = pd.read_csv(file, delimiter=',', encoding='utf-16', low_memory=False)
-            df['Model'] = model_code
-            df_list.append(df)
-        except Exception as e:
-            print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
-    if not df_list:
-        print("Could not read any Report 29 model files. Merge aborted.")
-        return
-    merged_df = pd.concat(df_list, ignore_index=True)
-    output_filepath = os.path.join(reports_path, "Todos Modelos_29.csv")
-    merged_df.to_csv(output_filepath, index=False, encoding='utf-16')
-    print(f"✅ Successfully merged all Report 29 models into: Todos Modelos_29.csv")
-
+    timings = {}
+    for mode in (["parallel"] if ingested else _merge_modes(len(csv_files))):
+        start_time = time.time()
+        df_list = []
+        if mode == "parallel":
+            with merge_process_pool() as executor:
+                futures = [(file, _ingested_or_submit(ingested, executor, _model_file_parser("29"), file, models_data)) for file in csv_files]
+                for file, future in futures:
+                    try:
+                        df_list.append(_from_ipc_bytes(future.result()).to_pandas())
+                    except Exception as e:
+                        print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
+        else:
+            for file in csv_files:
+                try:
+                    df_list.append(_read_model_file_29(file, _model_code(models_data, file)))
+                except Exception as e:
+                    print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
+        if not df_list:
+            print("Could not read any Report 29 model files. Merge aborted.")
+            return
+        merged_df = pd.concat(df_list, ignore_index=True)
+        write_intermediate(merged_df, reports_path, MERGED_29)
+        timings[mode] = time.time() - start_time
+    _print_merge_timings("Report 29", len(csv_files), timings)
+    print(f"✅ Successfully merged all Report 29 models into: {MERGED_29}.parquet")
+
+
+@traced()
 def process_merged_report_29(reports_path):
-    """Converts merged 'Todos Modelos_29.csv', adding PartNumber and chave columns."""
     print("\n--- Starting Final Processing for Report 29 ---")
-    csv_filepath = os.path.join(reports_path, "Todos Modelos_29.csv")
-    if not os.path.exists(csv_filepath):
-        print("Merged file 'Todos Modelos_29.csv' not found. Skipping.")
+    if not os.path.exists(intermediate_path(reports_path, MERGED_29)):
+        print(f"Merged file '{MERGED_29}.parquet' not found. Skipping.")
         return
     excel_filepath = os.path.join(reports_path, "Todos Modelos_29.xlsx")
     try:
-        df = pd.read_csv(csv_filepath, delimiter=',', encoding='utf-16', low_memory=False)
-        
-        df.to_excel(excel_filepath, index=False, engine='xlsxwriter')
+        df = apply_schema(read_intermediate(reports_path, MERGED_29), "29")
+        export_excel(excel_filepath, {"Sheet1": df})
         print(f"✅ Successfully created {os.path.basename(excel_filepath)}.")
-        os.remove(csv_filepath)
-        print("Intermediate CSV file 'Todos Modelos_29.csv' removed.")
+        remove_intermediate(reports_path, MERGED_29)
     except Exception as e:
-        print(f"ERROR: Could not process 'Todos Modelos_29.csv'. Reason: {e}")
+        print(f"ERROR: Could not process '{MERGED_29}.parquet'. Reason: {e}")
 
+def process_report_61(new_filename_base, session_pool, reports_path, credentials, base_path, on_file_saved=None):
+    return process_elaboration_report("61", session_pool, reports_path, credentials, base_path, on_file_saved)
 
-def process_merged_report_29(reports_path):
-    print("\n--- Starting Final Processing for Report 29 ---")
-    csv_filepath = os.path.join(reports_path, "Todos Modelos_29.csv")
-    if not os.path.exists(csv_filepath):
-        print("Merged file 'Todos Modelos_29.csv' not found. Skipping.")
-        return
-    excel_filepath = os.path.join(reports_path, "Todos Modelos_29.xlsx")
-    try:
-        df = pd.read_csv(csv_filepath, delimiter=',', encoding='utf-16', low_memory=False)
-        df.to_excel(excel_filepath, index=False, engine='xlsxwriter')
-        print(f"✅ Successfully created {os.path.basename(excel_filepath)}.")
-        os.remove(csv_filepath)
-        print("Intermediate CSV file 'Todos Modelos_29.csv' removed.")
-    except Exception as e:
-        print(f"ERROR: Could not process 'Todos Modelos_29.csv'. Reason: {e}")
 
-def process_report_61(new_filename_base, driver_path, reports_path, credentials, base_path):
-    thread_name = "Report-61"
-    print(f"\n--- [{thread_name}] Starting special process for Report 61 ---")
-    modelos_json_path = os.path.join(base_path, JSON_MODELS_FILE)
-    try:
-        with open(modelos_json_path, 'r', encoding='utf-8') as f:
-            models_to_process = json.load(f)
-        all_models_list = list(models_to_process.items())
-        chunk_size = 5
-        model_chunks = [all_models_list[i:i + chunk_size] for i in range(0, len(all_models_list), chunk_size)]
-        print(f"[{thread_name}] Loaded {len(all_models_list)} models, split into {len(model_chunks)} sequential chunks.")
-    except Exception as e:
-        print(f"[{thread_name}] ERROR: Could not load {JSON_MODELS_FILE}. {e}")
-        return
+def _report_61_columns(file_path):
+    """
+    Reads only the header of a Report 61 model file and returns the names of the columns
+    the merge keeps (the first 8 plus fQty), or None when the file has no fQty column.
+    """
+    header = list(pd.read_csv(file_path, delimiter=',', encoding='utf-16', nrows=0).columns)
+    if 'fQty' not in header:
+        return None
+    return header[:8] + ([] if 'fQty' in header[:8] else ['fQty'])
 
-    temp_download_path = os.path.join(reports_path, f"temp_{thread_name}_{os.getpid()}")
-    os.makedirs(temp_download_path, exist_ok=True)
-    edge_options = EdgeOptions()
-    prefs = {"download.default_directory": temp_download_path}
-    edge_options.add_experimental_option("prefs", prefs)
-    edge_options.add_argument("--log-level=3")
-    edge_options.add_argument("--inprivate")
-    edge_options.add_argument("--headless") # Optional: Run browser in background
-    
-    authenticated_url = f"https://{credentials['Usuario']}:{credentials['Senha']}@{BASE_URL_RELATORIO_61}"
-    service = webdriver.edge.service.Service(driver_path)
-    driver = webdriver.Edge(service=service, options=edge_options)
-    
-    try:
-        for chunk_index, current_chunk in enumerate(model_chunks):
-            print(f"\n[{thread_name}] --- Processing Chunk {chunk_index + 1}/{len(model_chunks)} ---")
-            driver.get(authenticated_url)
-            wait = WebDriverWait(driver, 60)
-            wait.until(EC.presence_of_element_located((By.ID, "MainContent_ddlModel")))
-            
-            future_date = date.today() + relativedelta(months=+6)
-            date_string = f"{future_date.month}/{future_date.day}/{future_date.year}"
-            driver.execute_script(f"arguments[0].value = '{date_string}';", wait.until(EC.presence_of_element_located((By.ID, "MainContent_txtDateFilter2_txtDate"))))
-            
-            activity_to_model_map = {}
-            for model_name, model_text in current_chunk:
-                try:
-                    Select(wait.until(EC.element_to_be_clickable((By.ID, "MainContent_ddlModel")))).select_by_visible_text(model_text)
-                    driver.find_element(By.ID, "MainContent_cmdConfirm").click()
-                    # time.sleep(2)
-                    wait.until(EC.text_to_be_present_in_element((By.ID, "MainContent_lblMessage"), "Elaboration correctly executed"))
-                    message_element = wait.until(EC.presence_of_element_located((By.ID, "MainContent_lblMessage")))
-                    message_text = message_element.text
-                    match = re.search(r'\d{7,}', message_text)
-
-                    if match:
-                        activity_id = match.group(0)
-                        activity_to_model_map[activity_id] = model_name
-                        print(f"[{thread_name}] Submitted '{model_name}', mapped to Activity ID: {activity_id}")
-                    else:
-                        print(f"[{thread_name}] WARNING: Submitted '{model_name}' but could not find Activity ID in text: {message_text}")
-                except (NoSuchElementException, TimeoutException) as e:
-                    print(f"[{thread_name}] WARNING: Model '{model_name}' could not be processed. Skipping. Error: {e}")
-            
-            if not activity_to_model_map:
-                print(f"[{thread_name}] No models in chunk {chunk_index + 1} successfully submitted. Skipping chunk.")
+
+def _iter_filtered_61(file_path, columns, chunk_rows):
+    """
+    Streams one Report 61 model file in `chunk_rows` chunks, reading only `columns`.
+    Yields the rows with col5 == 2, col6 in {1,2,3} and col7 in {1,2}, keeping the first
+    row of each column-4 value across the whole file through a running set, with the
+    "61" schema applied (categories are applied once the merged table is loaded).
+    """
+    key_column = columns[4]
+    seen_keys = set()
+    # Text everywhere except fQty keeps every chunk's dtypes identical for the columnar writer
+    reader = pd.read_csv(file_path, delimiter=',', encoding='utf-16', usecols=columns,
+                         dtype={c: str for c in columns if c != 'fQty'}, chunksize=chunk_rows)
+    for chunk in reader:
+        chunk = chunk[columns]
+        flags = [pd.to_numeric(chunk.iloc[:, i], errors='coerce') for i in (5, 6, 7)]
+        mask = (flags[0] == 2) & (flags[1].isin([1, 2, 3])) & (flags[2].isin([1, 2]))
+        filtered = chunk[mask].copy()
+        for i, flag in zip((5, 6, 7), flags):
+            filtered[columns[i]] = flag[mask]
+        keys = filtered[key_column]
+        filtered = filtered[~keys.duplicated() & ~keys.isin(seen_keys)]
+        seen_keys.update(filtered[key_column])
+        filtered = apply_schema(filtered, "61", categories=False)
+        if not filtered.empty:
+            yield filtered
+
+
+def _model_code(models_data, file_path):
+    model_name = os.path.splitext(os.path.basename(file_path))[0]
+    model_text = models_data.get(model_name)
+    return model_text.split()[0] if model_text else "UNKNOWN"
+
+
+def _to_ipc_bytes(df):
+    """Serializes a frame as an Arrow IPC stream, much cheaper to ship between processes than a pickle."""
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _from_ipc_bytes(buffer):
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+def _parse_model_file_61(file_path, model_code, chunk_rows):
+    """Process-pool worker: filtered rows of one Report 61 file as Arrow IPC, or None without fQty."""
+    columns = _report_61_columns(file_path)
+    if columns is None:
+        return None
+    frames = [filtered_df.assign(Model=model_code) for filtered_df in _iter_filtered_61(file_path, columns, chunk_rows)]
+    if not frames:
+        return b""
+    return _to_ipc_bytes(pd.concat(frames, ignore_index=True))
+
+
+def _merge_61_serial(csv_files, models_data, output):
+    for file in csv_files:
+        try:
+            columns = _report_61_columns(file)
+            if columns is None:
+                print(f"⚠️ Column 'fQty' not found in {os.path.basename(file)}. Skipping file.")
                 continue
+            model_code = _model_code(models_data, file)
+            for filtered_df in _iter_filtered_61(file, columns, MERGE_CHUNK_ROWS):
+                output.write(filtered_df.assign(Model=model_code))
+        except Exception as e:
+            print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
 
-            wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "#MainContent_lblMessage > a.actlink"))).click()
-            num_reports_in_chunk = len(activity_to_model_map)
-            print(f"[{thread_name}] On results page. Waiting for {num_reports_in_chunk} reports to finish...")
-            
-            max_wait_minutes = 15
-            start_time = time.time()
-            while True:
-                if time.time() - start_time > max_wait_minutes * 60:
-                    print(f"[{thread_name}] ERROR: Waited >{max_wait_minutes} mins. Proceeding with what is available.")
-                    break
-                ready_reports_count = 0
-                try:
-                    wait.until(EC.presence_of_element_located((By.XPATH, f"//tr[.//a[@id='dgElaborationRequests_cmdListFiles_{num_reports_in_chunk - 1}']]")))
-                    activity_cells = driver.find_elements(By.XPATH, f"//tr[.//a[starts-with(@id, 'dgElaborationRequests_cmdListFiles_')]][position() <= {num_reports_in_chunk}]/td[4]")
-                    for cell in activity_cells:
-                        if "gold" not in (cell.get_attribute("style") or "").lower():
-                            ready_reports_count += 1
-                    if ready_reports_count >= num_reports_in_chunk:
-                        print(f"[{thread_name}] ✅ All {num_reports_in_chunk} reports for this chunk are ready.")
-                        break
-                except TimeoutException: pass
-                try:
-                    wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Apply Filter']"))).click()
-                except Exception: driver.refresh()
-                time.sleep(5)
 
-            print(f"[{thread_name}] Starting download process...")
-            for activity_id, model_name_for_download in activity_to_model_map.items():
-                try:
-                    print(f"[{thread_name}] Locating report for model '{model_name_for_download}' (Activity ID: {activity_id})")
-                    
-                    row_xpath = f"//table[@id='dgElaborationRequests']//tr[contains(., '{activity_id}')]"
-                    report_row = wait.until(EC.presence_of_element_located((By.XPATH, row_xpath)))
+def merge_process_pool(workers=None):
+    """
+    Process pool for parsing model files. Workers are never forked straight from this process:
+    forking from a pipeline thread while another thread holds an import lock hangs the worker.
+    The fork server (not on Windows, which always spawns) is a clean single-threaded process
+    with pandas already imported, so its workers start almost as fast as plain forks.
+    Workers import this module afresh and only see its globals as written in the file, so
+    settings changed at runtime (MERGE_CHUNK_ROWS, JSON_MODELS_FILE, ...) must reach them as
+    arguments (see _model_file_parser). Workers also re-import the entry script as __mp_main__:
+    any script that starts the pipeline must keep its work under `if __name__ == "__main__":`.
+    """
+    context = multiprocessing.get_context(MERGE_START_METHOD)
+    if MERGE_START_METHOD == "forkserver":
+        context.set_forkserver_preload(["pandas", "pyarrow.parquet"])
+    return ProcessPoolExecutor(max_workers=workers or MERGE_WORKERS, mp_context=context)
 
-                    list_files_link = report_row.find_element(By.XPATH, ".//a[starts-with(@id, 'dgElaborationRequests_cmdListFiles_')]")
-                    
-                    for f in os.listdir(temp_download_path): os.remove(os.path.join(temp_download_path, f))
-                    list_files_link.click()
 
-                    wait.until(EC.element_to_be_clickable((By.ID, "dgFiles_hlkDownloadFile_0"))).click()
-                    newly_downloaded_path = wait_and_get_downloaded_file(temp_download_path, 120)
-                    
-                    if newly_downloaded_path:
-                        final_filename = f"{model_name_for_download}{os.path.splitext(newly_downloaded_path)[1]}"
-                        modelos_folder_path = os.path.join(reports_path, MODELS_SUBFOLDER_NAME_61)
-                        os.makedirs(modelos_folder_path, exist_ok=True)
-                        shutil.move(newly_downloaded_path, os.path.join(modelos_folder_path, final_filename))
-                        print(f"[{thread_name}] -> 💾 File successfully saved as: {final_filename}")
-                    else:
-                        print(f"[{thread_name}] -> ⚠️ WARNING: Download timed out for model '{model_name_for_download}'.")
-                    
-                    driver.back()
-                    wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
-                
-                except Exception as e:
-                    print(f"[{thread_name}] -> ❌ ERROR processing report for '{model_name_for_download}': {e}. Attempting to recover.")
-                    driver.get(driver.current_url)
-                    wait.until(EC.presence_of_element_located((By.ID, "dgElaborationRequests")))
+def _model_file_parser(report_id):
+    """The worker function for a report's model files, with this process's current settings bound to it."""
+    if report_id == "61":
+        return functools.partial(_parse_model_file_61, chunk_rows=MERGE_CHUNK_ROWS)
+    return _parse_model_file_29
 
-    except Exception as e:
-        print(f"\n[{thread_name}] ❌ FATAL ERROR during Report 61 processing: {e}")
-    finally:
-        print(f"[{thread_name}] Process finished. Closing browser.")
-        driver.quit()
-        if os.path.exists(temp_download_path):
-            shutil.rmtree(temp_download_path)
-    print(f"--- [{thread_name}] ✅ Special process for Report 61 completed. ---")
+
+def _ingested_or_submit(ingested, executor, parse_function, file, models_data):
+    """The future of a file parsed while downloading, or a new parse job for it."""
+    future = (ingested or {}).get(os.path.normpath(file))
+    if future is None:
+        future = executor.submit(parse_function, file, _model_code(models_data, file))
+    return future
 
 
-def merge_models_61(reports_path, base_path):
+def _merge_61_parallel(csv_files, models_data, output, ingested=None):
+    parse_function = _model_file_parser("61")
+    with merge_process_pool() as executor:
+        futures = [(file, _ingested_or_submit(ingested, executor, parse_function, file, models_data)) for file in csv_files]
+        # Results are consumed in file order, so the output does not depend on which worker finishes first
+        for file, future in futures:
+            try:
+                result = future.result()
+                if result is None:
+                    print(f"⚠️ Column 'fQty' not found in {os.path.basename(file)}. Skipping file.")
+                elif len(result):
+                    output.write_table(_from_ipc_bytes(result))
+            except Exception as e:
+                print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
+
+
+@traced()
+def merge_models_61(reports_path, base_path, ingested=None):
+    """
+    Merges the Report 61 model files into the 'merged_61' intermediate file without loading them whole.
+    Serially (MERGE_WORKERS = 1) each file is read chunk by chunk (only the needed columns),
+    filtered and appended to the output, so peak memory depends on MERGE_CHUNK_ROWS rather than
+    on the total BOM size. With MERGE_WORKERS > 1 the files are parsed in a process pool;
+    files in `ingested` (ModelIngestor) were already parsed while the download was running.
+    """
     print("\n--- Starting Report 61 Model File Merge Process ---")
     modelos_folder_path = os.path.join(reports_path, MODELS_SUBFOLDER_NAME_61)
     try:
@@ -541,66 +2314,49 @@ def merge_models_61(reports_path, base_path):
         print(f"ERROR: Could not load {JSON_MODELS_FILE}. Reason: {e}")
         return
 
-    csv_files = glob.glob(os.path.join(modelos_folder_path, "*.csv"))
+    csv_files = sorted(glob.glob(os.path.join(modelos_folder_path, "*.csv")))
     if not csv_files:
         print("No Report 61 model CSV files found to merge.")
         return
 
-    df_list = []
-    for file in csv_files:
-        try:
-            model_name = os.path.splitext(os.path.basename(file))[0]
-            model_text = models_data.get(model_name)
-            model_code = model_text.split()[0] if model_text else "UNKNOWN"
-            full_df = pd.read_csv(file, delimiter=',', encoding='utf-16', low_memory=False)
-            if 'fQty' not in full_df.columns:
-                print(f"⚠️ Column 'fQty' not found in {os.path.basename(file)}. Skipping file.")
-                continue
-            first_8 = full_df.iloc[:, :8].copy()
-            first_8["fQty"] = full_df["fQty"]
-            filtered_df = first_8[
-                (first_8.iloc[:, 5] == 2) &
-                (first_8.iloc[:, 6].isin([1, 2, 3])) &
-                (first_8.iloc[:, 7].isin([1, 2]))
-            ]
-            filtered_df = filtered_df.drop_duplicates(subset=filtered_df.columns[4])
-            if filtered_df.empty:
-                continue
-            filtered_df["Model"] = model_code
-            df_list.append(filtered_df)
-        except Exception as e:
-            print(f"ERROR: Could not process file '{os.path.basename(file)}'. Reason: {e}")
+    modes = ["parallel"] if ingested else _merge_modes(len(csv_files))
+    timings = {}
+    for mode in modes:
+        start_time = time.time()
+        with IntermediateWriter(reports_path, MERGED_61) as output:
+            if mode == "parallel":
+                _merge_61_parallel(csv_files, models_data, output, ingested)
+            else:
+                _merge_61_serial(csv_files, models_data, output)
+
+            if not output.rows:
+                print("No valid data to merge after filtering. Merge aborted.")
+                return
+            output.commit()
+        timings[mode] = time.time() - start_time
 
-    if not df_list:
-        print("No valid data to merge after filtering. Merge aborted.")
-        return
+    _print_merge_timings("Report 61", len(csv_files), timings)
+    print(f"✅ Successfully merged filtered Report 61 models into: {MERGED_61}.parquet ({output.rows} rows)")
 
-    merged_df = pd.concat(df_list, ignore_index=True)
-    output_filepath = os.path.join(reports_path, "Todos Modelos_61.csv")
-    merged_df.to_csv(output_filepath, index=False, encoding='utf-16')
-    print(f"✅ Successfully merged filtered Report 61 models into: Todos Modelos_61.csv")
 
+@traced()
 def process_merged_report_61(reports_path):
     print("\n--- Starting Final Processing for Report 61 ---")
-    csv_filepath = os.path.join(reports_path, "Todos Modelos_61.csv")
-    if not os.path.exists(csv_filepath):
-        print("Merged file 'Todos Modelos_61.csv' not found. Skipping.")
+    if not os.path.exists(intermediate_path(reports_path, MERGED_61)):
+        print(f"Merged file '{MERGED_61}.parquet' not found. Skipping.")
         return
     excel_filepath = os.path.join(reports_path, "Todos Modelos_61.xlsx")
     try:
-        df = pd.read_csv(csv_filepath, delimiter=',', encoding='utf-16', low_memory=False)
-        df.rename(columns={'vcCode': 'PartNumber'}, inplace=True)
-        df['PartNumber'] = pd.to_numeric(df['PartNumber'], errors='coerce')
-        df.dropna(subset=['PartNumber'], inplace=True)
-        df['PartNumber'] = df['PartNumber'].astype(int)
-        df['chave'] = df['PartNumber'].astype(str) + '_' + df['Model'].astype(str)
-        df.to_excel(excel_filepath, index=False, engine='xlsxwriter')
+        df = apply_schema(read_intermediate(reports_path, MERGED_61), "61")
+        df['chave'] = composite_key_text(df['PartNumber'], df['Model'])
+        write_intermediate(df, reports_path, STORE_61)
+        export_excel(excel_filepath, {"Sheet1": df})
         print(f"✅ Successfully created {os.path.basename(excel_filepath)}.")
-        os.remove(csv_filepath)
-        print("Intermediate CSV file 'Todos Modelos_61.csv' removed.")
+        remove_intermediate(reports_path, MERGED_61)
     except Exception as e:
-        print(f"ERROR: Could not process 'Todos Modelos_61.csv'. Reason: {e}")
+        print(f"ERROR: Could not process '{MERGED_61}.parquet'. Reason: {e}")
 
+@traced()
 def process_other_reports(main_reports_path):
     print(f"\n--- Processing Other Reports (32) ---")
     reports_to_process = { "Relatorio 32.csv": "Relatorio 32.xlsx" }
@@ -612,10 +2368,11 @@ def process_other_reports(main_reports_path):
             try:
                 destination_excel_path = os.path.join(main_reports_path, excel_name)
                 print(f"Converting '{csv_name}' to Excel...")
-                df = pd.read_csv(source_path, delimiter=',', encoding='utf-16', low_memory=False)
-                df.rename(columns={'ElementNode': 'PartNumber'}, inplace=True)
-                df['PartNumber'] = df['PartNumber'].astype(str).str[:-1].str.lstrip('0')
-                df.to_excel(destination_excel_path, index=False)
+                df = pd.read_csv(source_path, delimiter=',', encoding='utf-16', dtype=schema_read_dtypes("32"), low_memory=False)
+                df = apply_schema(df, "32")
+                df['PartNumber'] = df['PartNumber'].str[:-1].str.lstrip('0')
+                write_intermediate(df, main_reports_path, STORE_32)
+                export_excel(destination_excel_path, {"Sheet1": df})
                 print(f"-> Successfully created '{excel_name}'.")
                 os.remove(source_path)
             except Exception as e:
@@ -624,6 +2381,7 @@ def process_other_reports(main_reports_path):
         print("No reports for 'Outros_relatorios' were found to process.")
 
 
+@traced()
 def Create_Compare_Table(reports_path,credentials):
     try:
         print("\n--- Running Create_Compare_Table ---")
@@ -631,47 +2389,65 @@ def Create_Compare_Table(reports_path,credentials):
         relatorio32_path = os.path.join(reports_path, "Relatorio 32.xlsx")
         todos_modelos_path = os.path.join(reports_path, "Todos Modelos_61.xlsx")
 
-        # Check for necessary files before proceeding
-        required_files = [pfep_path, relatorio32_path, todos_modelos_path]
-        for f in required_files:
-            if not os.path.exists(f):
-                print(f"❌ ERROR in Create_Compare_Table: Missing required file: {os.path.basename(f)}")
+        # Check for necessary files before proceeding (columnar store first, Excel export as fallback)
+        required_files = [
+            (pfep_path, pfep_path),
+            (intermediate_path(reports_path, STORE_32), relatorio32_path),
+            (intermediate_path(reports_path, STORE_61), todos_modelos_path),
+        ]
+        for store_file, excel_file in required_files:
+            if not os.path.exists(store_file) and not os.path.exists(excel_file):
+                print(f"❌ ERROR in Create_Compare_Table: Missing required file: {os.path.basename(excel_file)}")
                 return
 
-        pfep_df = pd.read_excel(pfep_path, dtype=str, header=9)
-        pfep_df_update = pd.read_excel(pfep_path, dtype=str, header=9)
-        pfep_df['Part Number'] = pfep_df['Part Number'].str.strip().str.lower()
-        pfep_df['Modelo'] = pfep_df['Modelo'].str.strip().str.lower()
-        pfep_df['Chave'] = pfep_df['Part Number'] + "_" + pfep_df['Modelo']
-        pfep_keys = set(pfep_df['Chave'])
-
-        todos_df = pd.read_excel(todos_modelos_path, dtype=str)
-        todos_df['chave'] = todos_df['chave'].str.strip().str.lower()
-        todos_keys = set(todos_df['chave'])
-        
-        rel32_df = pd.read_excel(relatorio32_path, dtype=str)
-        rel32_df = rel32_df.rename(columns={'DescriptionElementNode': 'Descrição', 'Weight': 'Peso'})
-
-        phase_in_keys = todos_keys - pfep_keys
-        phase_in_df = todos_df[todos_df['chave'].isin(phase_in_keys)].copy()
-        
-        phase_in_df['PN Codep'] = phase_in_df['PartNumber'].str.strip().str.lower()
-        rel32_df['PN Codep'] = rel32_df['PartNumber'].str.strip().str.lower()
-        rel32_df.drop_duplicates(subset=['PN Codep'], inplace=True)
+        pfep_df = load_pfep(pfep_path)
+        todos_df = load_report_table(reports_path, STORE_61, "Todos Modelos_61.xlsx", "61")
+        rel32_df = load_report_table(reports_path, STORE_32, "Relatorio 32.xlsx", "32")
+
+        # Part numbers and models as integer codes shared by the three tables (see KEY ENCODING)
+        (todos_pn, pfep_pn, rel32_pn), pn_values = encode_key_columns(todos_df['PartNumber'], pfep_df['Part Number'], rel32_df['PartNumber'])
+        (todos_model, pfep_model), model_values = encode_key_columns(todos_df['Model'], pfep_df['Modelo'])
+        todos_keys = composite_keys(todos_pn, todos_model, len(model_values))
+        pfep_keys = composite_keys(pfep_pn, pfep_model, len(model_values))
+
+        phase_in_rows = missing_keys(todos_keys, pfep_keys)
+        phase_in_df = todos_df[phase_in_rows].copy()
+        phase_in_df['PN Codep'] = todos_pn[phase_in_rows]
+        rel32_lookup = rel32_df[['Descrição', 'Peso']].assign(**{'PN Codep': rel32_pn})
+        rel32_lookup = rel32_lookup[rel32_lookup['PN Codep'] >= 0].drop_duplicates(subset=['PN Codep'])
         
-        phase_in_df = pd.merge(phase_in_df, rel32_df[['PN Codep', 'Descrição', 'Peso']], on='PN Codep', how='left')
+        phase_in_df = pd.merge(phase_in_df, rel32_lookup, on='PN Codep', how='left')
         phase_in_df = phase_in_df[phase_in_df['Descrição'].notna() & (phase_in_df['Descrição'].str.strip() != '')].copy()
         
         phase_in_df.rename(columns={'Modelo': 'Model', 'PartNumber': 'RTM # PFEP', 'vcCodeParent': 'MATRICULA', 'fQty': 'fQty', 'nidElementTypeParent': 'Tipo'}, inplace=True)
         phase_in_df = phase_in_df[['Model', 'RTM # PFEP', 'Descrição', 'MATRICULA', 'fQty', 'Tipo', 'Peso']]
+        phase_in_df['RTM # PFEP'] = _as_text(phase_in_df['RTM # PFEP'])  # Searched in E-PER and cached as text
         # *** NEW STEP: Update weights before final concatenation ***
-        phase_in_df = update_weights(phase_in_df, pfep_df_update,credentials)
-
-
-        phase_out_keys = pfep_keys - todos_keys
-        phase_out_df = pfep_df[pfep_df['Chave'].isin(phase_out_keys)].copy()
-        phase_out_df.rename(columns={'Modelo': 'Model', 'Part Number': 'PFEP # RTM'}, inplace=True)
-        phase_out_df = phase_out_df[['Model', 'PFEP # RTM', 'Chave']].drop_duplicates()
+        # Part numbers whose weight is settled in the last run's snapshot skip the PFEP/cache/E-PER lookups
+        snapshot = load_compare_snapshot(reports_path)
+        pfep_signature = _pfep_signature(pfep_path)
+        input_weights = exact_float64(phase_in_df['Peso'])
+        weight_cache = WeightCache(os.path.join(reports_path, WEIGHT_CACHE_FILE))
+        try:
+            reused_df, to_update_df = reuse_snapshot_weights(phase_in_df, snapshot, pfep_signature, weight_cache)
+            if len(reused_df):
+                print(f"♻️ Reusing snapshot weights for {len(reused_df)} of {len(phase_in_df)} phase-in rows.")
+            if len(to_update_df):
+                to_update_df = update_weights(to_update_df, pfep_df,credentials, weight_cache=weight_cache)
+            else:
+                to_update_df = to_update_df.assign(**{'Origem Peso': pd.Series(dtype=object)})
+        finally:
+            weight_cache.close()
+        phase_in_df = pd.concat([reused_df, to_update_df]).sort_index()
+
+
+        phase_out_rows = missing_keys(pfep_keys, todos_keys)
+        phase_out_df = pd.DataFrame({
+            'Model': decode_key_column(pfep_model[phase_out_rows], model_values),
+            'PFEP # RTM': decode_key_column(pfep_pn[phase_out_rows], pn_values),
+        })
+        phase_out_df['Chave'] = phase_out_df['PFEP # RTM'] + "_" + phase_out_df['Model']
+        phase_out_df = phase_out_df.drop_duplicates()
         
         max_len = max(len(phase_in_df), len(phase_out_df))
         empty_cols = pd.DataFrame([['', '']] * max_len, columns=['x', ''])
@@ -699,13 +2475,17 @@ def Create_Compare_Table(reports_path,credentials):
 
         # 3. Save the DataFrames to a single Excel file, each on its own sheet.
         output_path = os.path.join(reports_path, "Todos Comparativos.xlsx")
-        with pd.ExcelWriter(output_path) as writer:
-            final_df.to_excel(writer, sheet_name='Comparativo', index=False)
-            todos_peso_a_corrigir.to_excel(writer, sheet_name='todos_peso_a_corrigir', index=False)
-            correcao_unico_por_desc.to_excel(writer, sheet_name='correcao unico por desc', index=False)
+        export_excel(output_path, {
+            'Comparativo': final_df,
+            'todos_peso_a_corrigir': todos_peso_a_corrigir,
+            'correcao unico por desc': correcao_unico_por_desc,
+        })
         
         print(f"✅ File with multiple sheets created: {output_path}")
         # --- END: New logic ---
+
+        export_change_log(reports_path, compare_deltas(snapshot, phase_in_df, phase_out_df[phase_out_df['Chave'] != '']), snapshot)
+        save_compare_snapshot(reports_path, phase_in_df, phase_out_df[phase_out_df['Chave'] != ''], input_weights, pfep_signature)
        
          
         # output_path = os.path.join(reports_path, "Todos Comparativos.xlsx")
@@ -716,7 +2496,273 @@ def Create_Compare_Table(reports_path,credentials):
         print(f"❌ ERROR in Create_Compare_Table: {e}")
 
 
-def update_weights(phase_in_df, pfep_df,credentials):
+# ====================================================================================
+# --- KEY ENCODING ---
+# ====================================================================================
+
+def encode_key_columns(*columns):
+    """
+    Integer codes for the normalized (stripped, lowercased) values of several key columns,
+    shared across all of them so codes from different tables can be joined directly.
+    Only distinct raw values are normalized. Missing values get -1.
+    Returns ([int64 codes per column], Index of normalized values by code).
+    """
+    combined = pd.concat([pd.Series(column).reset_index(drop=True) for column in columns], ignore_index=True)
+    raw_codes, raw_values = pd.factorize(combined)
+    normalized_codes, normalized_values = pd.factorize(pd.Index(raw_values).astype(str).str.strip().str.lower())
+    codes = np.full(len(combined), -1, dtype=np.int64)
+    present = raw_codes >= 0
+    codes[present] = normalized_codes[raw_codes[present]]
+    bounds = np.cumsum([0] + [len(column) for column in columns])
+    return [codes[start:end] for start, end in zip(bounds[:-1], bounds[1:])], pd.Index(normalized_values)
+
+
+def composite_keys(part_number_codes, model_codes, model_count):
+    """One int64 per (part number, model) pair; -1 where either part is missing."""
+    keys = part_number_codes * model_count + model_codes
+    keys[(part_number_codes < 0) | (model_codes < 0)] = -1
+    return keys
+
+
+def decode_key_column(codes, values):
+    """Normalized text for codes from encode_key_columns, NaN for -1."""
+    return pd.Series(values.take(codes, allow_fill=True, fill_value=np.nan), dtype=object)
+
+
+def missing_keys(keys, other_keys):
+    """Hash anti-join: True where a key has no match in other_keys (missing keys never match)."""
+    return ~pd.Series(keys).isin(other_keys[other_keys >= 0]).to_numpy()
+
+
+def composite_key_text(part_numbers, models):
+    """
+    The 'PartNumber_Model' text key, built once per distinct pair and shared by all rows
+    with that pair instead of concatenating strings row by row.
+    """
+    pn_codes, pn_values = pd.factorize(part_numbers, use_na_sentinel=False)
+    model_codes, model_values = pd.factorize(models, use_na_sentinel=False)
+    pair_codes, pairs = pd.factorize(pn_codes.astype(np.int64) * len(model_values) + model_codes)
+    pair_text = pd.Index(pn_values).astype(str)[pairs // len(model_values)] + "_" + pd.Index(model_values).astype(str)[pairs % len(model_values)]
+    return pd.Series(pair_text.take(pair_codes), index=part_numbers.index, dtype=object)
+
+
+# ====================================================================================
+# --- COMPARISON SNAPSHOTS ---
+# ====================================================================================
+
+def _phase_in_keys(phase_in_df):
+    return phase_in_df['RTM # PFEP'].astype(str).str.strip().str.lower() + "_" + phase_in_df['Model'].astype(str).str.strip().str.lower()
+
+
+def _weight_key(part_numbers):
+    return part_numbers.astype(str).str.strip().str.lower()
+
+
+def load_compare_snapshot(reports_path):
+    """
+    Returns the snapshot saved by the last comparison as {"keys", "weights", "taken_at", "pfep"},
+    or None when there is none (first run) or it cannot be read.
+    keys: Chave, Model, Part Number, Estado (COMPARE_PHASE_IN / COMPARE_PHASE_OUT)
+    weights: PN, Peso Relatório 32 (weight before update_weights), Peso, Origem Peso
+    """
+    import pyarrow.parquet as pq
+    keys_path = intermediate_path(reports_path, COMPARE_SNAPSHOT_KEYS)
+    weights_path = intermediate_path(reports_path, COMPARE_SNAPSHOT_WEIGHTS)
+    if not os.path.exists(keys_path) or not os.path.exists(weights_path):
+        return None
+    try:
+        metadata = pq.read_schema(keys_path).metadata or {}
+        return {
+            "keys": pd.read_parquet(keys_path),
+            "weights": pd.read_parquet(weights_path),
+            "taken_at": float(metadata.get(b"snapshot_taken_at", b"0")),
+            "pfep": {key: metadata.get(f"pfep_{key}".encode(), b"").decode() for key in ("mtime_ns", "size")},
+        }
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"⚠️ Could not read the comparison snapshot: {e}")
+        return None
+
+
+def save_compare_snapshot(reports_path, phase_in_df, phase_out_df, input_weights, pfep_signature):
+    """Saves this run's phase-in/phase-out keys and chosen weights for the next run's delta."""
+    import pyarrow.parquet as pq
+    keys_df = pd.concat([
+        pd.DataFrame({'Chave': _phase_in_keys(phase_in_df), 'Model': phase_in_df['Model'].astype(str),
+                      'Part Number': phase_in_df['RTM # PFEP'].astype(str), 'Estado': COMPARE_PHASE_IN}),
+        pd.DataFrame({'Chave': phase_out_df['Chave'].astype(str), 'Model': phase_out_df['Model'].astype(str),
+                      'Part Number': phase_out_df['PFEP # RTM'].astype(str), 'Estado': COMPARE_PHASE_OUT}),
+    ], ignore_index=True).drop_duplicates(subset=['Chave', 'Estado'])
+    weights_df = pd.DataFrame({
+        'PN': _weight_key(phase_in_df['RTM # PFEP']),
+        'Peso Relatório 32': input_weights.to_numpy(dtype=float),
+        'Peso': pd.to_numeric(phase_in_df['Peso'], errors='coerce').to_numpy(dtype=float),
+        'Origem Peso': phase_in_df['Origem Peso'].astype(str).str.removesuffix(WEIGHT_SOURCE_SNAPSHOT_SUFFIX).to_numpy(),
+    }).drop_duplicates(subset=['PN'])
+
+    metadata = {b"snapshot_taken_at": str(time.time()).encode()}
+    metadata.update({f"pfep_{key}".encode(): value.encode() for key, value in pfep_signature.items()})
+    for name, df in ((COMPARE_SNAPSHOT_WEIGHTS, weights_df), (COMPARE_SNAPSHOT_KEYS, keys_df)):
+        path = intermediate_path(reports_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        pq.write_table(table, path + ".tmp", compression=INTERMEDIATE_COMPRESSION)
+        os.replace(path + ".tmp", path)
+
+
+def reuse_snapshot_weights(phase_in_df, snapshot, pfep_signature, weight_cache=None):
+    """
+    Splits phase_in_df into rows whose weight can be taken from the snapshot and rows that
+    still need update_weights. A weight is reused when the part number had a weight other
+    than the default last run, its Relatório 32 weight is unchanged, the snapshot is younger
+    than COMPARE_SNAPSHOT_MAX_AGE_DAYS and, for PFEP weights, the PFEP workbook is unchanged.
+    E-PER and cached weights are only reused while their weight cache entry is still valid with
+    the same weight, so reuse never outlives WEIGHT_CACHE_TTL_DAYS.
+    Returns (reused rows with Peso and Origem Peso filled in, rows to update).
+    """
+    if snapshot is None or time.time() - snapshot["taken_at"] > COMPARE_SNAPSHOT_MAX_AGE_DAYS * 86400:
+        return phase_in_df.iloc[:0].assign(**{'Origem Peso': pd.Series(dtype=object)}), phase_in_df
+
+    previous = snapshot["weights"].set_index('PN')
+    previous = previous[previous['Origem Peso'] != WEIGHT_SOURCE_DEFAULT]
+    if snapshot["pfep"] != pfep_signature:
+        previous = previous[~previous['Origem Peso'].str.startswith("PFEP")]
+
+    pn_keys = _weight_key(phase_in_df['RTM # PFEP'])
+    input_weights = exact_float64(phase_in_df['Peso'])
+    previous_input = pn_keys.map(previous['Peso Relatório 32'])
+    same_input = (previous_input == input_weights) | (previous_input.isna() & input_weights.isna())
+    reusable = pn_keys.isin(previous.index) & same_input
+
+    previous_source = pn_keys.map(previous['Origem Peso']).fillna('')
+    cache_based = reusable & (previous_source.str.startswith(WEIGHT_SOURCE_EPER) | previous_source.str.endswith("(cache)"))
+    if cache_based.any():
+        cache_keys = phase_in_df['RTM # PFEP'][cache_based].astype(str).str.strip()
+        cached = weight_cache.lookup(cache_keys.unique())[0] if weight_cache is not None else {}
+        cached_weights = cache_keys.map(lambda key: cached[key][0] if key in cached else float('nan')).astype(float)
+        still_valid = (cached_weights - pn_keys[cache_based].map(previous['Peso'])).abs() <= COMPARE_WEIGHT_TOLERANCE_KG
+        reusable[cache_based] = still_valid.to_numpy(dtype=bool)
+
+    reused_df = phase_in_df[reusable].copy()
+    reused_df['Peso'] = pn_keys[reusable].map(previous['Peso'])
+    reused_df['Origem Peso'] = pn_keys[reusable].map(previous['Origem Peso']) + WEIGHT_SOURCE_SNAPSHOT_SUFFIX
+    return reused_df, phase_in_df[~reusable]
+
+
+def compare_deltas(snapshot, phase_in_df, phase_out_df):
+    """
+    Change log between the snapshot and this run: new and resolved phase-ins and phase-outs,
+    and part numbers whose chosen weight changed. Without a snapshot everything is new.
+    """
+    current = pd.concat([
+        pd.DataFrame({'Chave': _phase_in_keys(phase_in_df), 'Model': phase_in_df['Model'].astype(str),
+                      'Part Number': phase_in_df['RTM # PFEP'].astype(str), 'Estado': COMPARE_PHASE_IN}),
+        pd.DataFrame({'Chave': phase_out_df['Chave'].astype(str), 'Model': phase_out_df['Model'].astype(str),
+                      'Part Number': phase_out_df['PFEP # RTM'].astype(str), 'Estado': COMPARE_PHASE_OUT}),
+    ], ignore_index=True).drop_duplicates(subset=['Chave', 'Estado'])
+    previous = snapshot["keys"] if snapshot is not None else current.iloc[:0]
+
+    changes = []
+    for state, new_label, resolved_label in ((COMPARE_PHASE_IN, CHANGE_NEW_PHASE_IN, CHANGE_RESOLVED_PHASE_IN),
+                                             (COMPARE_PHASE_OUT, CHANGE_NEW_PHASE_OUT, CHANGE_RESOLVED_PHASE_OUT)):
+        now_keys = current[current['Estado'] == state]
+        before_keys = previous[previous['Estado'] == state]
+        changes.append(now_keys[~now_keys['Chave'].isin(before_keys['Chave'])].assign(Mudança=new_label))
+        changes.append(before_keys[~before_keys['Chave'].isin(now_keys['Chave'])].assign(Mudança=resolved_label))
+    change_log = pd.concat(changes, ignore_index=True)[['Mudança', 'Model', 'Part Number', 'Chave']]
+    change_log['Peso anterior'] = float('nan')
+    change_log['Peso atual'] = float('nan')
+    change_log['Origem Peso'] = ''
+
+    if snapshot is not None and len(phase_in_df):
+        weights = pd.DataFrame({
+            'PN': _weight_key(phase_in_df['RTM # PFEP']), 'Part Number': phase_in_df['RTM # PFEP'].astype(str),
+            'Model': phase_in_df['Model'].astype(str), 'Peso atual': pd.to_numeric(phase_in_df['Peso'], errors='coerce'),
+            'Origem Peso': phase_in_df['Origem Peso'],
+        })
+        models = weights.groupby('PN')['Model'].agg(lambda m: ", ".join(sorted(set(m))))
+        weights = weights.drop_duplicates(subset=['PN']).set_index('PN')
+        weights['Model'] = models
+        weights['Peso anterior'] = snapshot["weights"].set_index('PN')['Peso']
+        changed = weights['Peso anterior'].notna() & ((weights['Peso atual'] - weights['Peso anterior']).abs() > COMPARE_WEIGHT_TOLERANCE_KG)
+        weight_changes = weights[changed].reset_index(drop=True).assign(Mudança=CHANGE_WEIGHT, Chave='')
+        change_log = pd.concat([change_log, weight_changes[change_log.columns]], ignore_index=True)
+    return change_log
+
+
+def export_change_log(reports_path, change_log, snapshot):
+    """Writes the compact change log workbook: a summary sheet and one row per change."""
+    since = datetime.fromtimestamp(snapshot["taken_at"]).strftime('%d/%m/%Y %H:%M') if snapshot is not None else "—"
+    labels = [CHANGE_NEW_PHASE_IN, CHANGE_RESOLVED_PHASE_IN, CHANGE_NEW_PHASE_OUT, CHANGE_RESOLVED_PHASE_OUT, CHANGE_WEIGHT]
+    counts = change_log['Mudança'].value_counts()
+    summary = pd.DataFrame({'Mudança': labels, 'Quantidade': [int(counts.get(label, 0)) for label in labels]})
+    summary.loc[len(summary)] = ["Comparado com o snapshot de", since]
+    output_path = os.path.join(reports_path, COMPARE_CHANGE_LOG_FILE)
+    export_excel(output_path, {'Resumo': summary, 'Alterações': change_log})
+    print(f"✅ Change log since {since}: " + ", ".join(f"{label}: {count}" for label, count in zip(labels, summary['Quantidade'])))
+    print(f"✅ File created: {output_path}")
+
+
+# ====================================================================================
+# --- PART WEIGHT CACHE ---
+# ====================================================================================
+
+class WeightCache:
+    """
+    On-disk SQLite cache of part weights, keyed by part number.
+    Each entry keeps the weight in kg (NULL for a confirmed 'not found' in E-PER),
+    its source, when it was stored and how long it stays valid.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS part_weights ("
+            " part_number TEXT PRIMARY KEY,"
+            " weight_kg REAL,"
+            " source TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " ttl_seconds REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def lookup(self, part_numbers):
+        """
+        Returns ({pn: (weight_kg, source)}, {pn, ...}) for the entries that are still valid:
+        the known weights and the part numbers E-PER recently confirmed it does not have.
+        """
+        found, not_found = {}, set()
+        now = time.time()
+        keys = list({str(pn).strip() for pn in part_numbers})
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT part_number, weight_kg, source FROM part_weights"
+                f" WHERE part_number IN ({','.join('?' * len(batch))}) AND stored_at + ttl_seconds > ?",
+                (*batch, now),
+            ).fetchall()
+            for part_number, weight_kg, source in rows:
+                if weight_kg is None:
+                    not_found.add(part_number)
+                else:
+                    found[part_number] = (weight_kg, source)
+        return found, not_found
+
+    def store(self, weights, source, ttl_days=WEIGHT_CACHE_TTL_DAYS):
+        """Stores {pn: weight_kg} (weight None = not found) with the given source and TTL."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO part_weights (part_number, weight_kg, source, stored_at, ttl_seconds) VALUES (?, ?, ?, ?, ?)",
+            [(str(pn).strip(), weight, source, now, ttl_days * 86400) for pn, weight in weights.items()],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+@traced()
+def update_weights(phase_in_df, pfep_df,credentials, weight_cache=None):
     
     print("\n--- Running update_weights ---")
     
@@ -736,64 +2782,212 @@ def update_weights(phase_in_df, pfep_df,credentials):
     pfep_lookup_df['pfep_desc'] = pfep_lookup_df['pfep_desc'].str.strip().str.lower()
     
     # Convert weight column to numeric, coercing errors to NaN
-    pfep_lookup_df['pfep_peso'] = pd.to_numeric(pfep_lookup_df['pfep_peso'], errors='coerce')
+    pfep_lookup_df['pfep_peso'] = exact_float64(pfep_lookup_df['pfep_peso'])
     
-    # Create dictionaries for quick lookups
-    pn_to_weight = pfep_lookup_df.dropna(subset=['pfep_pn', 'pfep_peso']).set_index('pfep_pn')['pfep_peso'].to_dict()
-    desc_to_weight = pfep_lookup_df.dropna(subset=['pfep_desc', 'pfep_peso']).set_index('pfep_desc')['pfep_peso'].to_dict()
+    # Lookup tables keyed by the cleaned PN / description (last PFEP row wins, as with a dict)
+    pn_to_weight = pfep_lookup_df.dropna(subset=['pfep_pn', 'pfep_peso']).drop_duplicates('pfep_pn', keep='last').set_index('pfep_pn')['pfep_peso']
+    desc_to_weight = pfep_lookup_df.dropna(subset=['pfep_desc', 'pfep_peso']).drop_duplicates('pfep_desc', keep='last').set_index('pfep_desc')['pfep_peso']
 
     # Convert 'Peso' in the target df to numeric
-    updated_phase_in_df['Peso'] = pd.to_numeric(updated_phase_in_df['Peso'], errors='coerce').fillna(1.0)
-
-    rows_to_check = updated_phase_in_df[updated_phase_in_df['Peso'] == 1.0]
-    print(f"Found {len(rows_to_check)} rows with weight=1 to check against PFEP data.")
+    peso = exact_float64(updated_phase_in_df['Peso'])
+    origem = pd.Series(WEIGHT_SOURCE_REPORT_32, index=peso.index, dtype=object)
+    origem[peso.isna() | (peso == 1.0)] = WEIGHT_SOURCE_DEFAULT
+    peso = peso.fillna(1.0)
+    part_numbers = updated_phase_in_df['RTM # PFEP']
+
+    to_check = peso == 1.0
+    print(f"Found {int(to_check.sum())} rows with weight=1 to check against PFEP data.")
+
+    # 1. Check by Part Number, 2. if the PN is not in PFEP, check by Description
+    pn_keys = part_numbers.astype(str).str.strip().str.lower()
+    desc_keys = updated_phase_in_df['Descrição'].astype(str).str.strip().str.lower()
+    pn_hit = to_check & pn_keys.isin(pn_to_weight.index)
+    desc_hit = to_check & ~pn_hit & desc_keys.isin(desc_to_weight.index)
+    pfep_weight = pn_keys[pn_hit].map(pn_to_weight)
+    pfep_weight = pd.concat([pfep_weight, desc_keys[desc_hit].map(desc_to_weight)]).sort_index()
+    pfep_source = pd.Series(WEIGHT_SOURCE_PFEP_DESC, index=pfep_weight.index, dtype=object)
+    pfep_source[pn_hit[pfep_weight.index]] = WEIGHT_SOURCE_PFEP_PN
+
+    # 3. Apply the valid matches in one go
+    valid = pfep_weight != 1.0
+    pfep_weight, pfep_source = pfep_weight[valid], pfep_source[valid]
+    peso[pfep_weight.index] = pfep_weight
+    origem[pfep_weight.index] = pfep_source
+    pfep_matches = {WEIGHT_SOURCE_PFEP_PN: {}, WEIGHT_SOURCE_PFEP_DESC: {}}
+    for pn, weight, source in zip(part_numbers[pfep_weight.index], pfep_weight, pfep_source):
+        pfep_matches[source][pn] = weight
+    print(f"  - Updated {len(pfep_weight)} rows from PFEP ({len(pfep_matches[WEIGHT_SOURCE_PFEP_PN])} PNs by part number, {len(pfep_matches[WEIGHT_SOURCE_PFEP_DESC])} by description)")
 
-    for index, row in rows_to_check.iterrows():
-        rtm_pn = str(row['RTM # PFEP']).strip().lower()
-        descricao = str(row['Descrição']).strip().lower()
-        new_weight = None
+    # Identify parts that still have weight=1 for scraping
+    pns_for_scraping = part_numbers[peso == 1.0].unique().tolist()
+
+    # Serve what we can from the weight cache; only misses and expired entries go to E-PER
+    if weight_cache is not None:
+        for source, matches in pfep_matches.items():
+            weight_cache.store(matches, source)
+        cached, cached_not_found = weight_cache.lookup(pns_for_scraping)
+        cache_hit = part_numbers.isin(pns_for_scraping) & part_numbers.astype(str).str.strip().isin(cached.keys())
+        cache_keys = part_numbers[cache_hit].astype(str).str.strip()
+        peso[cache_hit] = cache_keys.map(lambda key: cached[key][0])
+        origem[cache_hit] = cache_keys.map(lambda key: f"{cached[key][1]} (cache)")
+        print(f"  - Updated {int(cache_hit.sum())} rows with cached weights")
+        pns_for_scraping = [pn for pn in pns_for_scraping if str(pn).strip() not in cached and str(pn).strip() not in cached_not_found]
+        print(f"Weight cache: {len(cached)} hits, {len(cached_not_found)} known not found, {len(pns_for_scraping)} to look up in E-PER.")
 
-        # 1. Check by Part Number
-        if rtm_pn in pn_to_weight:
-            new_weight = pn_to_weight[rtm_pn]
+    # Call the scraping function
+    not_found = set()
+    scraped_results = E_PER(pns_for_scraping,credentials, not_found=not_found)
 
-        # 2. If not found, check by Description
-        elif descricao in desc_to_weight:
-            new_weight = desc_to_weight[descricao]
+    # Update weights based on scraping results: all rows with a scraped PN, in one assignment
+    if scraped_results:
+        scraped_hit = part_numbers.isin(scraped_results.keys())
+        peso[scraped_hit] = part_numbers[scraped_hit].map(scraped_results)
+        origem[scraped_hit] = WEIGHT_SOURCE_EPER
+        print(f"  - Updated {int(scraped_hit.sum())} rows with scraped weights for {len(scraped_results)} PNs")
 
-        # 3. Update DataFrame if a new valid weight was found
-        if new_weight is not None and new_weight != 1.0:
-            updated_phase_in_df.loc[index, 'Peso'] = new_weight
-            print(f"  - Updated PN {row['RTM # PFEP']} weight to {new_weight}")
+    updated_phase_in_df['Peso'] = peso
+    updated_phase_in_df['Origem Peso'] = origem
 
-    # Identify parts that still have weight=1 for scraping
-    pns_for_scraping = updated_phase_in_df[updated_phase_in_df['Peso'] == 1.0]['RTM # PFEP'].unique().tolist()
-    
-    # Call the scraping function
-    scraped_results = E_PER(pns_for_scraping,credentials)
+    if weight_cache is not None:
+        weight_cache.store(scraped_results, WEIGHT_SOURCE_EPER)
+        weight_cache.store({pn: None for pn in not_found}, WEIGHT_SOURCE_EPER, ttl_days=WEIGHT_CACHE_NOT_FOUND_TTL_DAYS)
 
-    # Update weights based on scraping results
-    if scraped_results:
-        for pn, weight in scraped_results.items():
-            # Find all rows with this PN and update their weight
-            updated_phase_in_df.loc[updated_phase_in_df['RTM # PFEP'] == pn, 'Peso'] = weight
-            print(f"  - Updated PN {pn} with scraped weight {weight}")
-            
     print("--- Weight update process complete ---")
     return updated_phase_in_df
 
 
-def E_PER(pns_for_scraping, credentials):
+async def _eper_lookup(page, pn):
+    """
+    Searches one part number on an E-PER page. Returns the weight in kg, or None if the part details
+    table rendered without a weight. Raises a Playwright TimeoutError if the details never render,
+    so a slow page is retried on the next run instead of being cached as not found.
+    """
+    labels = page.locator("td.part_details_label")
+    values = page.locator("td.part_details_value")
+    # On a reused page the previous PN's details are still attached (and the page may already be idle),
+    # so wait until they are replaced or the details show the searched PN before reading any weight
+    previous_details = await labels.first.element_handle() if await labels.count() else None
+    await page.fill("input[id='fPNumber']", pn)
+    await page.keyboard.press("Enter")
+    if previous_details is not None:
+        await page.wait_for_function(EPER_NEW_DETAILS_JS, arg=[previous_details, pn], timeout=EPER_PN_TIMEOUT_SECONDS * 1000)
+    await page.wait_for_load_state("networkidle", timeout=EPER_PN_TIMEOUT_SECONDS * 1000)
+    await labels.first.wait_for(state="attached", timeout=EPER_DETAILS_WAIT_SECONDS * 1000)
+
+    for i in range(await labels.count()):
+        label_text = (await labels.nth(i).inner_text()).strip()
+        if "Peso em gramas:" in label_text:
+            peso_value = (await values.nth(i).inner_text()).strip()
+            return float(peso_value.replace(',', '.')) / 1000
+    return None
+
+
+async def _e_per_async(pns_for_scraping, credentials, not_found=None):
+    """
+    Looks up part numbers on EPER_CONCURRENCY pages of one logged-in browser context.
+    Part numbers are fed through a bounded queue; each lookup has its own timeout and a
+    page that timed out is sent back to the search page before taking the next PN.
+    """
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+    scraped_weights = {}
+    chromium_exe = Chrome_driver_path
+    if not chromium_exe.exists():
+        raise FileNotFoundError(f"❌ Chromium not found at: {chromium_exe}")
+
+    print(f"✅ Chromium binary path: {chromium_exe}")
+    print(f"🌐 Launching browser with {EPER_CONCURRENCY} pages...")
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, executable_path=str(chromium_exe))
+        try:
+            context = await browser.new_context()
+            login_page = await context.new_page()
+            print("🔐 Logging into E-PER...")
+            await login_page.goto(EPER_LOGIN_URL)
+            await login_page.fill("input[name='username']", credentials["Usuario"])
+            await login_page.fill("input[name='password']", credentials["Senha"])
+            await login_page.select_option("select[name='loginType']", "Fiat AUTO/MyUser/Link.e.entry")
+            await login_page.click("input[type='button']")
+            await login_page.wait_for_load_state("networkidle", timeout=60000)
+            search_url = login_page.url
+            print("✅ Login successful.")
+
+            worker_count = max(1, min(EPER_CONCURRENCY, len(pns_for_scraping)))
+            pages = [login_page]
+            for _ in range(worker_count - 1):
+                page = await context.new_page()
+                await page.goto(search_url)
+                pages.append(page)
+
+            pn_queue = asyncio.Queue(maxsize=EPER_QUEUE_SIZE)
+
+            async def produce():
+                for pn in pns_for_scraping:
+                    await pn_queue.put(pn)
+                for _ in pages:
+                    await pn_queue.put(None)
+
+            async def work(page):
+                while True:
+                    pn = await pn_queue.get()
+                    if pn is None:
+                        return
+                    try:
+                        with tracer.span("eper.lookup", pn=pn) as span:
+                            peso_kg = await asyncio.wait_for(_eper_lookup(page, pn), EPER_PN_TIMEOUT_SECONDS)
+                            span.set(found=peso_kg is not None)
+                        if peso_kg is None:
+                            print(f"  ⚠️ Peso not found for PN {pn}")
+                            if not_found is not None:
+                                not_found.add(pn)
+                        else:
+                            scraped_weights[pn] = peso_kg
+                            print(f"  ✅ {pn}: {peso_kg:.3f} kg")
+                    except (asyncio.TimeoutError, PlaywrightTimeoutError):
+                        print(f"  ❌ Timeout searching for PN {pn}")
+                        try:
+                            await page.goto(search_url)
+                        except Exception:
+                            pass
+                    except Exception as e:
+                        print(f"  ❌ Error for PN {pn}: {e}")
+
+            await asyncio.gather(produce(), *(work(page) for page in pages))
+        finally:
+            print("🛑 Closing browser...")
+            await browser.close()
+    return scraped_weights
+
+
+@traced()
+def E_PER(pns_for_scraping, credentials, not_found=None):
+    """
+    Scrapes E-PER for the weight of each part number and returns {pn: kg}.
+    If a `not_found` set is given, part numbers E-PER answered without a weight are added to it
+    (timeouts and errors are not, so they are retried on the next run).
+    """
+    from playwright.sync_api import sync_playwright
    
     print("\n--- 🚀 Starting E-PER Web Scraping ---")
     if not pns_for_scraping:
         print("No part numbers provided.")
         return {}
+    if not EPER_ENABLED:
+        print(f"E-PER lookups are disabled. Skipping {len(pns_for_scraping)} part numbers.")
+        return {}
 
     print(f"🔍 Checking {len(pns_for_scraping)} part numbers:")
     for pn in pns_for_scraping:
         print(f"  • {pn}")
 
+    if EPER_CONCURRENCY > 1:
+        try:
+            scraped_weights = asyncio.run(_e_per_async(pns_for_scraping, credentials, not_found))
+        except Exception as e:
+            print(f"❌ Playwright setup error: {e}")
+            scraped_weights = {}
+        print("\n✅ Scraping complete.")
+        return scraped_weights
+
     username = credentials["Usuario"]
     password = credentials["Senha"]
     scraped_weights = {}
@@ -818,7 +3012,7 @@ def E_PER(pns_for_scraping, credentials):
             try:
                 # Login
                 print("🔐 Logging into E-PER...")
-                page.goto("https://eper-ltm.parts.fiat.com/navi?EU=1&eperLogin=0&sso=false&COUNTRY=076&RMODE=DEFAULT&SEARCH_TYPE=codpart&KEY=HOME")
+                page.goto(EPER_LOGIN_URL)
                 page.fill("input[name='username']", username)
                 page.fill("input[name='password']", password)
                 page.select_option("select[name='loginType']", "Fiat AUTO/MyUser/Link.e.entry")
@@ -829,31 +3023,38 @@ def E_PER(pns_for_scraping, credentials):
                 
                 for pn in pns_for_scraping:
                     print(f"\n🔎 Searching for PN: {pn}")
-                    try:
-                        page.fill("input[id='fPNumber']", pn)
-                        page.keyboard.press("Enter")
-                        page.wait_for_load_state("networkidle", timeout=50000)
-                        time.sleep(2)
-
-                        labels = page.locator("td.part_details_label")
-                        values = page.locator("td.part_details_value")
-
-                        for i in range(labels.count()):
-                            label_text = labels.nth(i).inner_text().strip()
-
-                            if "Peso em gramas:" in label_text:
-                                peso_value = values.nth(i).inner_text().strip()
-                                peso_kg = float(peso_value.replace(',', '.')) / 1000
-                                scraped_weights[pn] = peso_kg
-                                print(f"  ✅ {pn}: {peso_value} g → {peso_kg:.3f} kg")
-                                break
-                        else:
-                            print(f"  ⚠️ Peso not found for PN {pn}")
-
-                    except TimeoutError:
-                        print(f"  ❌ Timeout searching for PN {pn}")
-                    except Exception as e:
-                        print(f"  ❌ Error for PN {pn}: {e}")
+                    with tracer.span("eper.lookup", pn=pn):
+                        try:
+                            page.fill("input[id='fPNumber']", pn)
+                            page.keyboard.press("Enter")
+                            page.wait_for_load_state("networkidle", timeout=50000)
+                            time.sleep(2)
+
+                            labels = page.locator("td.part_details_label")
+                            values = page.locator("td.part_details_value")
+
+                            for i in range(labels.count()):
+                                label_text = labels.nth(i).inner_text().strip()
+
+                                if "Peso em gramas:" in label_text:
+                                    peso_value = values.nth(i).inner_text().strip()
+                                    peso_kg = float(peso_value.replace(',', '.')) / 1000
+                                    scraped_weights[pn] = peso_kg
+                                    print(f"  ✅ {pn}: {peso_value} g → {peso_kg:.3f} kg")
+                                    break
+                            else:
+                                if labels.count() == 0:
+                                    # Details table not rendered yet: not a confirmed miss, retried on the next run
+                                    print(f"  ❌ Part details did not load for PN {pn}")
+                                else:
+                                    print(f"  ⚠️ Peso not found for PN {pn}")
+                                    if not_found is not None:
+                                        not_found.add(pn)
+
+                        except TimeoutError:
+                            print(f"  ❌ Timeout searching for PN {pn}")
+                        except Exception as e:
+                            print(f"  ❌ Error for PN {pn}: {e}")
 
                     time.sleep(1)
 
@@ -874,67 +3075,340 @@ def E_PER(pns_for_scraping, credentials):
 
 
 
-def main_script_logic():
-    """Main function to run the entire RPA process."""
+# ====================================================================================
+# --- PIPELINE SCHEDULER ---
+# ====================================================================================
+
+class ModelIngestor:
+    """
+    Parses Report 29/61 model files in a process pool as soon as they are downloaded,
+    so the merge only has to collect results that are already waiting.
+    Pass `on_file_saved` as the report's download hook and `ingested()` to the merge.
+    """
+    def __init__(self, report_id, base_path, workers=None):
+        self.report_id = report_id
+        self.parse_function = _model_file_parser(report_id)
+        self.workers = workers or MERGE_WORKERS
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        try:
+            with open(os.path.join(base_path, JSON_MODELS_FILE), 'r', encoding='utf-8') as f:
+                self.models_data = json.load(f)
+        except Exception:
+            self.models_data = {}
+
+    def on_file_saved(self, model_name, path):
+        with self._lock:
+            if self._executor is None:
+                self._executor = merge_process_pool(self.workers)
+            self._futures[os.path.normpath(path)] = self._executor.submit(self.parse_function, path, _model_code(self.models_data, path))
+
+    def ingested(self):
+        with self._lock:
+            return dict(self._futures)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class PipelineScheduler:
+    """
+    Runs named stages on a thread pool, each one as soon as all the stages it depends on
+    have finished, so independent work (e.g. the Report 61 merge while Report 29 is still
+    elaborating) overlaps. Each stage runs under a thread named after it, which keeps the
+    [thread_name] log prefixes. A stage that raises skips everything that depends on it.
+    At the end the critical path (the chain of stages that set the total time) is printed.
+    """
+    def __init__(self, max_workers=PIPELINE_WORKERS):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name, function, depends_on=()):
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'.")
+        self.stages[name] = (function, tuple(depends_on))
+
+    def _run_stage(self, name, function):
+        thread = threading.current_thread()
+        previous_name, thread.name = thread.name, name
+        start_time = time.time()
+        try:
+            with tracer.span(name):
+                function()
+        finally:
+            self.timings[name] = (start_time, time.time())
+            thread.name = previous_name
+
+    def run(self):
+        """Runs every stage. Returns the names of the stages that failed or were skipped."""
+        run_start = time.time()
+        waiting = {name: set(depends_on) for name, (_, depends_on) in self.stages.items()}
+        failed = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Pipeline") as executor:
+            while waiting or running:
+                for name in [n for n, deps in waiting.items() if not deps]:
+                    del waiting[name]
+                    running[traced_submit(executor, self._run_stage, name, self.stages[name][0])] = name
+                if not running:
+                    break
+                done, _ = wait_futures(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"[Pipeline] ❌ Stage '{name}' failed: {e}")
+                        self._skip_dependents(name, waiting, failed)
+                        failed.add(name)
+                        continue
+                    for deps in waiting.values():
+                        deps.discard(name)
+        self._print_critical_path(time.time() - run_start)
+        return failed
+
+    def _skip_dependents(self, name, waiting, failed):
+        for other in [n for n, deps in waiting.items() if name in deps]:
+            if other in waiting:
+                print(f"[Pipeline] ⏭️ Skipping '{other}' because '{name}' did not complete.")
+                del waiting[other]
+                failed.add(other)
+                self._skip_dependents(other, waiting, failed)
+
+    def critical_path(self):
+        """Chain of finished stages ending at the last one, following the latest-finishing dependency."""
+        if not self.timings:
+            return []
+        path = [max(self.timings, key=lambda n: self.timings[n][1])]
+        while True:
+            finished = [d for d in self.stages[path[-1]][1] if d in self.timings]
+            if not finished:
+                break
+            path.append(max(finished, key=lambda n: self.timings[n][1]))
+        return path[::-1]
+
+    def _print_critical_path(self, wall_seconds):
+        path = self.critical_path()
+        if not path:
+            return
+        steps = " → ".join(f"{name} ({self.timings[name][1] - self.timings[name][0]:.1f}s)" for name in path)
+        busy = sum(self.timings[name][1] - self.timings[name][0] for name in path)
+        print(f"\n[Pipeline] ⏱️ Finished in {wall_seconds:.1f}s. Critical path ({busy:.1f}s of work): {steps}")
+
+
+def _stage_group(stage):
+    """Pipeline stage name → the PIPELINE_STAGE_GROUPS entry that selects it."""
+    for group, prefixes in PIPELINE_STAGE_GROUPS.items():
+        if stage.startswith(prefixes):
+            return group
+    return None
+
+
+def main_script_logic(stages=None, reports=None):
+    """
+    Main function to run the entire RPA process.
+    stages: groups from PIPELINE_STAGE_GROUPS to run (default: all of them).
+    reports: report ids from REPORTS_TO_DOWNLOAD to run (default: all of them).
+    Returns an exit code: EXIT_OK, EXIT_FAILED (a stage failed or did not produce its
+    output), EXIT_SETUP_ERROR (driver/credentials/paths) or EXIT_INTERRUPTED.
+    """
     global Chrome_driver_path
+    stages = set(stages or PIPELINE_STAGE_GROUPS)
+    reports = set(reports or [report_id for report_id, _ in REPORTS_TO_DOWNLOAD])
     try:
-        base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+        base_path = get_base_path()
         driver_path = os.path.join(base_path, DRIVER_FOLDER_NAME, DRIVER_NAME)
         Chrome_driver_path = Path(base_path) / DRIVER_FOLDER_NAME / "chrome-win" / "chrome.exe"
         reports_path = os.path.join(base_path, REPORTS_FOLDER_NAME)
 
     except Exception as e:
         print(f"FATAL: Could not determine script paths. Error: {e}")
-        return
+        return EXIT_SETUP_ERROR
 
-    if not os.path.exists(driver_path):
+    if "download" in stages and not os.path.exists(driver_path):
         print(f"FATAL: Driver not found at {driver_path}")
-        return
+        return EXIT_SETUP_ERROR
 
     os.makedirs(reports_path, exist_ok=True)
     os.makedirs(os.path.join(reports_path, MODELS_SUBFOLDER_NAME_61), exist_ok=True)
     os.makedirs(os.path.join(reports_path, MODELS_SUBFOLDER_NAME_29), exist_ok=True)
     
-    try:
-        with open(os.path.join(base_path, JSON_CREDENTIALS_FILE), 'r', encoding='utf-8') as f:
-            credentials = json.load(f)
-    except Exception as e:
-        print(f"FATAL: Could not load credentials. Error: {e}")
-        return
+    credentials = {}
+    if stages & {"download", "compare"}:  # Portal login and E-PER lookups
+        try:
+            with open(os.path.join(base_path, JSON_CREDENTIALS_FILE), 'r', encoding='utf-8') as f:
+                credentials = json.load(f)
+        except Exception as e:
+            print(f"FATAL: Could not load credentials. Error: {e}")
+            return EXIT_SETUP_ERROR
+
+    session_pool = None
+    if "download" in stages:
+        print("--- 🌐 Opening Edge session pool ---")
+        session_pool = EdgeSessionPool(driver_path, reports_path, credentials, size=EDGE_POOL_SIZE)
+        session_pool.start()
+
+    # Model files are parsed while the rest of the report is still downloading
+    ingestors = {}
+    if MERGE_WORKERS > 1 and stages >= {"download", "process"}:
+        ingestors = {report_id: ModelIngestor(report_id, base_path) for report_id in ("61", "29") if report_id in reports}
+
+    def hook(report_id):
+        return ingestors[report_id].on_file_saved if report_id in ingestors else None
+
+    def merge_stage(merge_function, report_id):
+        def run():
+            ingestor = ingestors.get(report_id)
+            try:
+                merge_function(reports_path, base_path, ingested=ingestor.ingested() if ingestor else None)
+            finally:
+                if ingestor:
+                    ingestor.close()
+        return run
+
+    tracer.start_trace(os.path.join(reports_path, TRACE_FILE))
+    print(f"--- 🚀 Starting the report pipeline (stages: {', '.join(sorted(stages))}; reports: {', '.join(sorted(reports))}) ---")
+    scheduler = PipelineScheduler()
+
+    def add(stage, function, depends_on=()):
+        group = _stage_group(stage)
+        report_id = stage.rsplit("-", 1)[-1]
+        if group in stages and (not report_id.isdigit() or report_id in reports):
+            scheduler.add(stage, function, depends_on=[d for d in depends_on if d in scheduler.stages])
+
+    # Downloads log their errors instead of raising; raise here so the stage fails and nothing is
+    # merged or compared from files left over by an earlier run
+    def elaboration_stage(process_function, report_id, report_name):
+        def run():
+            failed_models = process_function(report_name, session_pool, reports_path, credentials, base_path, hook(report_id))
+            if failed_models is None:
+                raise RuntimeError(f"Report {report_id}: the model list could not be loaded.")
+            if failed_models:
+                raise RuntimeError(f"Report {report_id}: no file for {len(failed_models)} models ({', '.join(failed_models)}).")
+        return run
+
+    def standard_stage(report_id, report_name):
+        def run():
+            if not download_standard_report(report_id, report_name, session_pool, reports_path, credentials):
+                raise RuntimeError(f"Report {report_id} was not downloaded.")
+        return run
 
-    print("--- 🚀 Starting All Report Downloads Concurrently ---")
-    all_threads = []
     for report_id, report_name in REPORTS_TO_DOWNLOAD:
-        thread = None
+        stage = f"Report-{report_id}"
         if report_id == "61":
-            thread = threading.Thread(target=process_report_61, args=(report_name, driver_path, reports_path, credentials, base_path), name=f"Report-{report_id}")
+            add(stage, elaboration_stage(process_report_61, "61", report_name))
         elif report_id == "29":
-            thread = threading.Thread(target=process_report_29, args=(report_name, driver_path, reports_path, credentials, base_path), name=f"Report-{report_id}")
+            add(stage, elaboration_stage(process_report_29, "29", report_name))
         elif report_id == "32":
-            thread = threading.Thread(target=download_standard_report, args=(report_id, report_name, driver_path, reports_path, credentials), name=f"Report-{report_id}")
-        
-        if thread:
-            all_threads.append(thread)
-            thread.start()
-            time.sleep(2)
+            add(stage, standard_stage("32", report_name))
+    download_stages = [stage for stage in scheduler.stages if stage.startswith("Report-")]
+    if session_pool is not None:
+        scheduler.add("EdgePool-Close", session_pool.close, depends_on=download_stages)
+
+    add("Merge-61", merge_stage(merge_models_61, "61"), depends_on=["Report-61"])
+    add("Final-61", lambda: process_merged_report_61(reports_path), depends_on=["Merge-61"])
+    add("Merge-29", merge_stage(merge_models_29, "29"), depends_on=["Report-29"])
+    add("Final-29", lambda: process_merged_report_29(reports_path), depends_on=["Merge-29"])
+    add("Convert-32", lambda: process_other_reports(reports_path), depends_on=["Report-32"])
+    add("Compare", lambda: Create_Compare_Table(reports_path, credentials), depends_on=["Final-61", "Convert-32"])
+
+    if stages & {"process", "compare"}:
+        load_now(np, pd, pa, xlsxwriter)
+    if "download" in stages and DOWNLOAD_BACKEND == "http":
+        load_now(urllib3)
+    run_start = time.time()
+    failed = set()
+    try:
+        with tracer.span("run"):
+            failed = scheduler.run()
+    except KeyboardInterrupt:
+        print("\n--- ⛔ Interrupted. ---")
+        return EXIT_INTERRUPTED
+    finally:
+        if session_pool is not None:
+            session_pool.close()
+        for ingestor in ingestors.values():
+            ingestor.close()
+        tracer.end_trace()
+
+    print_trace_summary(tracer.spans)
+    print(f"Trace saved to {os.path.join(reports_path, TRACE_FILE)} (trace {tracer.trace_id}).")
+
+    # Most stages log their errors instead of raising, so also check each one wrote its file this run
+    for stage, output_name in PIPELINE_STAGE_OUTPUTS.items():
+        output_path = os.path.join(reports_path, output_name)
+        if stage in scheduler.stages and stage not in failed:
+            if not os.path.exists(output_path) or os.path.getmtime(output_path) < run_start - 1:
+                print(f"[Pipeline] ❌ Stage '{stage}' did not produce '{output_name}'.")
+                failed.add(stage)
+    if failed:
+        print(f"\n--- ⚠️ Process completed with problems in: {', '.join(sorted(failed))} ---")
+        return EXIT_FAILED
+    print("\n--- ✨ Full process completed. ---")
+    return EXIT_OK
+
+
+def run_cli(argv=None):
+    """Headless entry point: runs main_script_logic without the Tk window and returns its exit code."""
+    global JSON_MODELS_FILE
+    parser = argparse.ArgumentParser(description="Runs the PFEP report pipeline without the GUI.")
+    parser.add_argument("--stages", nargs="+", choices=list(PIPELINE_STAGE_GROUPS), default=list(PIPELINE_STAGE_GROUPS),
+                        help="Pipeline stage groups to run (default: all). Later stages use the files already in the Reports folder.")
+    parser.add_argument("--reports", nargs="+", choices=[report_id for report_id, _ in REPORTS_TO_DOWNLOAD],
+                        default=[report_id for report_id, _ in REPORTS_TO_DOWNLOAD], help="Reports to run (default: all).")
+    parser.add_argument("--models-file", help=f"Models JSON to use instead of {JSON_MODELS_FILE} next to the program.")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="Only compare the time to import this module against importing every heavy dependency up front.")
+    args = parser.parse_args(argv)
+
+    if args.measure_startup:
+        measure_startup()
+        return EXIT_OK
+    if args.models_file:
+        if not os.path.exists(args.models_file):
+            print(f"FATAL: Models file not found at {args.models_file}")
+            return EXIT_SETUP_ERROR
+        JSON_MODELS_FILE = os.path.abspath(args.models_file)  # os.path.join keeps absolute paths as they are
+    try:
+        return main_script_logic(stages=args.stages, reports=args.reports)
+    except KeyboardInterrupt:
+        print("\n--- ⛔ Interrupted. ---")
+        return EXIT_INTERRUPTED
 
-    for thread in all_threads:
-        thread.join()
-    
-    print("\n--- ✅ All download tasks have finished. ---")
-    print("\n--- 🔄 Starting Post-Processing ---")
-    
-    merge_models_61(reports_path, base_path)
-    process_merged_report_61(reports_path)
-    
-    merge_models_29(reports_path, base_path)
-    process_merged_report_29(reports_path)
-    
-    process_other_reports(reports_path)
-    
-    Create_Compare_Table(reports_path,credentials)
 
-    print("\n--- ✨ Full process completed. ---")
+def measure_startup(runs=STARTUP_MEASURE_RUNS):
+    """
+    Median wall time of a fresh interpreter importing this module, as it is now (heavy
+    modules on first use) and with every heavy dependency imported up front like before.
+    """
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    module_name = os.path.splitext(os.path.basename(__file__))[0]
+    eager = "; ".join(f"import {name}" for name in STARTUP_EAGER_MODULES)
+    variants = {
+        "lazy (current)": f"import {module_name}",
+        "eager (all imports up front)": f"import {module_name}; {eager}",
+    }
+    results = {}
+    for label, statement in variants.items():
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", statement], cwd=module_dir, capture_output=True, text=True)
+            samples.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                print(f"⚠️ '{label}' failed: {completed.stderr.strip().splitlines()[-1]}")
+                break
+        results[label] = statistics.median(samples)
+        print(f"{label:<30} {results[label] * 1000:8.0f} ms (median of {len(samples)})")
+    lazy, eager_time = results.values()
+    print(f"Startup saved: {(eager_time - lazy) * 1000:.0f} ms ({eager_time / lazy:.1f}x faster)")
+    return results
 
 
 # ====================================================================================
@@ -942,6 +3416,9 @@ def main_script_logic():
 # ====================================================================================
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for the merge process pool in the packaged .exe
+    if len(sys.argv) > 1:  # Any argument means a headless run (see run_cli)
+        sys.exit(run_cli())
     root = tk.Tk()
     app = App(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,498 @@
+import os
+import re
+import json
+import math
+import time
+import base64
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+import Extract
+import Benchmark
+
+# ====================================================================================
+# --- FAKE PORTAL CONFIGURATION ---
+# ====================================================================================
+
+FAKE_PORTAL_HOST = "127.0.0.1"
+FAKE_PORTAL_PORT = 8765
+FAKE_USER = "bench"
+FAKE_PASSWORD = "bench"
+DEFAULT_MODELS = 20
+DEFAULT_LATENCY_SECONDS = 30  # Time an elaboration stays pending (gold) after it is submitted
+DEFAULT_LATENCY_JITTER = 0.25  # +/- share of the latency, drawn per activity
+DEFAULT_PAGE_DELAY_SECONDS = 0.05  # Server think time added to every page
+DEFAULT_FILE_ROWS = 20_000  # Rows in each elaborated model file (sets the download size)
+FIRST_ACTIVITY_ID = 4_100_000
+RESULTS_FILE = "portal_benchmark_results.json"
+
+PROCEDURES = {"29": "Relatorio 29", "32": "Relatorio 32", "61": "Relatorio 61"}
+ACTIVITIES_PATH = "/bom/Functions/AllactivitiesList.aspx"
+ELABORATION_PATHS = {"/bom/Elab/elab29.aspx": "29", "/bom/Elab/elab61.aspx": "61"}
+REQUESTS_PATH = "/bom/Elab/ElabRequests.aspx"
+DOWNLOAD_PATH = "/bom/Files/Download.aspx"
+PENDING_STYLE = "background-color:Gold;"
+READY_STYLE = "background-color:LightGreen;"
+
+# ====================================================================================
+# --- PORTAL STATE ---
+# ====================================================================================
+
+class Activity:
+    def __init__(self, activity_id, report_id, model_text, date_filter, latency):
+        self.activity_id = activity_id
+        self.report_id = report_id
+        self.model_text = model_text
+        self.date_filter = date_filter
+        self.submitted_at = time.time()
+        self.ready_at = self.submitted_at + latency
+        self.downloaded_at = None
+
+    def is_ready(self):
+        return time.time() >= self.ready_at
+
+
+class FakePortal:
+    """
+    In-memory state of the stand-in RTM portal: the models that can be elaborated,
+    every activity submitted so far and the (cached) files they produce.
+    """
+    def __init__(self, models_data, latency=DEFAULT_LATENCY_SECONDS, jitter=DEFAULT_LATENCY_JITTER,
+                 page_delay=DEFAULT_PAGE_DELAY_SECONDS, file_rows=DEFAULT_FILE_ROWS, seed=Benchmark.DEFAULT_SEED,
+                 user=FAKE_USER, password=FAKE_PASSWORD):
+        self.models_data = models_data
+        self.latency = latency
+        self.jitter = jitter
+        self.page_delay = page_delay
+        self.file_rows = file_rows
+        self.seed = seed
+        self.auth_header = "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.activities = {}
+        self.page_count = 0
+        self._next_id = FIRST_ACTIVITY_ID
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._files_lock = threading.Lock()
+
+    def submit(self, report_id, model_text, date_filter):
+        with self._lock:
+            self._next_id += int(self._rng.integers(1, 50))
+            latency = self.latency * (1 + self.jitter * (2 * self._rng.random() - 1))
+            activity = Activity(str(self._next_id), report_id, model_text, date_filter, latency)
+            self.activities[activity.activity_id] = activity
+        return activity
+
+    def grid(self):
+        """Activities as listed in dgElaborationRequests, newest first."""
+        with self._lock:
+            return sorted(self.activities.values(), key=lambda a: a.submitted_at, reverse=True)
+
+    def file_bytes(self, report_id, model_text=None):
+        """UTF-16 CSV for a report (and model), generated once and reused by every download."""
+        key = (report_id, model_text)
+        with self._files_lock:
+            if key not in self._files:
+                rng = np.random.default_rng(self.seed + len(self._files))
+                part_numbers = Benchmark.make_part_numbers(max(10, int(self.file_rows * Benchmark.PART_NUMBER_RATIO)))
+                if report_id == "32":
+                    df = Benchmark.report_32_rows(rng, part_numbers)
+                else:
+                    df = Benchmark.report_rows(rng, self.file_rows, part_numbers, (model_text or "0").split()[0])
+                self._files[key] = df.to_csv(index=False).encode('utf-16')
+            return self._files[key]
+
+    def stats(self):
+        """Per-activity timings as seen by the portal."""
+        activities = list(self.activities.values())
+        downloaded = [a for a in activities if a.downloaded_at]
+        return {
+            "submitted": len(activities),
+            "downloaded": len(downloaded),
+            "pages_served": self.page_count,
+            "mean_elaboration_seconds": _mean([a.ready_at - a.submitted_at for a in activities]),
+            "mean_ready_to_download_seconds": _mean([a.downloaded_at - a.ready_at for a in downloaded]),
+        }
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def _encode_state(state):
+    return base64.b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_state(value):
+    try:
+        return json.loads(base64.b64decode(value or ""))
+    except ValueError:
+        return {}
+
+# ====================================================================================
+# --- HTML PAGES ---
+# ====================================================================================
+
+def _page(title, action, state, body):
+    """ASP.NET style page: one post-back form with __EVENTTARGET, __EVENTARGUMENT and __VIEWSTATE."""
+    return f"""<!DOCTYPE html>
+<html><head><title>{escape(title)}</title>
+<script type="text/javascript">
+function __doPostBack(eventTarget, eventArgument) {{
+    var theForm = document.forms['form1'];
+    theForm.__EVENTTARGET.value = eventTarget;
+    theForm.__EVENTARGUMENT.value = eventArgument;
+    theForm.submit();
+}}
+</script></head>
+<body><form name="form1" method="post" action="{escape(action)}" id="form1">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{_encode_state(state)}" />
+{body}
+</form></body></html>"""
+
+
+def _activities_page(action, procedure=None):
+    options = "".join(
+        f'<option value="{report_id}"{" selected" if report_id == procedure else ""}>{escape(name)}</option>'
+        for report_id, name in PROCEDURES.items())
+    body = f"""<select name="ddlProcedures" id="ddlProcedures" onchange="__doPostBack('ddlProcedures','')">
+<option value="">-- Select --</option>{options}</select>"""
+    if procedure:
+        body += f"""
+<table id="dgActivities"><tr><th></th><th>Activity</th><th>Date</th></tr>
+<tr><td><a id="dgActivities_cmdListFiles_0" href="javascript:__doPostBack('dgActivities$ctl02$cmdListFiles','')">List files</a></td>
+<td>{escape(PROCEDURES[procedure])}</td><td>{datetime.now():%m/%d/%Y %H:%M:%S}</td></tr></table>"""
+    return _page("All Activities", action, {"procedure": procedure}, body)
+
+
+def _files_page(action, download_href):
+    rows = ""
+    if download_href:
+        rows = f'<tr><td><a id="dgFiles_hlkDownloadFile_0" href="{escape(download_href)}">Download</a></td></tr>'
+    body = f'<table id="dgFiles"><tr><th>File</th></tr>{rows}</table>'
+    return _page("Files", action, {}, body)
+
+
+def _elaboration_page(action, portal, report_id, date_filter="", message=""):
+    options = "".join(f"<option>{escape(text)}</option>" for text in portal.models_data.values())
+    body = f"""<span id="MainContent_lblMessage">{message}</span>
+<select name="ctl00$MainContent$ddlModel" id="MainContent_ddlModel">{options}</select>
+<input name="ctl00$MainContent$txtDateFilter2$txtDate" type="text" id="MainContent_txtDateFilter2_txtDate" value="{escape(date_filter)}" />
+<input type="submit" name="ctl00$MainContent$cmdConfirm" value="Confirm" id="MainContent_cmdConfirm" />"""
+    return _page(f"Elaboration {report_id}", action, {}, body)
+
+
+def _requests_page(action, portal):
+    activities = portal.grid()
+    rows = []
+    for index, activity in enumerate(activities):
+        pending = not activity.is_ready()
+        rows.append(
+            f"<tr><td><a id=\"dgElaborationRequests_cmdListFiles_{index}\" "
+            f"href=\"javascript:__doPostBack('dgElaborationRequests$ctl{index + 2:02d}$cmdListFiles','')\">Files</a></td>"
+            f"<td>{activity.activity_id}</td>"
+            f"<td>{datetime.fromtimestamp(activity.submitted_at):%m/%d/%Y %H:%M:%S}</td>"
+            f"<td style=\"{PENDING_STYLE if pending else READY_STYLE}\">{'Running' if pending else 'Completed'}</td>"
+            f"<td>{activity.report_id}</td><td>{escape(activity.model_text)}</td><td>{escape(activity.date_filter)}</td></tr>")
+    body = f"""<input type="submit" name="cmdApplyFilter" value="Apply Filter" id="cmdApplyFilter" />
+<table id="dgElaborationRequests"><tr><th></th><th>Activity</th><th>Requested</th><th>Status</th><th>Type</th><th>Model</th><th>Date Filter</th></tr>
+{''.join(rows)}</table>"""
+    return _page("Elaboration Requests", action, {"rows": [a.activity_id for a in activities]}, body)
+
+# ====================================================================================
+# --- HTTP SERVER ---
+# ====================================================================================
+
+class FakePortalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as with IIS
+    server_version = "Microsoft-IIS/10.0"
+
+    @property
+    def portal(self):
+        return self.server.portal
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _authorized(self):
+        if self.headers.get("Authorization") == self.portal.auth_header:
+            return True
+        self._send(401, b"Unauthorized", "text/plain", {"WWW-Authenticate": 'Basic realm="RTM"'})
+        return False
+
+    def _send(self, status, data, content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_html(self, html):
+        self._send(200, html.encode("utf-8"))
+
+    def _redirect(self, location):
+        self._send(303, b"", "text/plain", {"Location": location})
+
+    def _action(self, url):
+        return url.path + (f"?{url.query}" if url.query else "")
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        with self.portal._lock:
+            self.portal.page_count += 1
+        if url.path == DOWNLOAD_PATH:
+            return self._download(parse_qs(url.query))
+        time.sleep(self.portal.page_delay)
+        if url.path == ACTIVITIES_PATH:
+            self._send_html(_activities_page(self._action(url)))
+        elif url.path in ELABORATION_PATHS:
+            self._send_html(_elaboration_page(self._action(url), self.portal, ELABORATION_PATHS[url.path]))
+        elif url.path == REQUESTS_PATH:
+            self._send_html(_requests_page(self._action(url), self.portal))
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        fields = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True).items()}
+        with self.portal._lock:
+            self.portal.page_count += 1
+        time.sleep(self.portal.page_delay)
+        target = fields.get("__EVENTTARGET", "")
+        state = _decode_state(fields.get("__VIEWSTATE"))
+        action = self._action(url)
+
+        if url.path == ACTIVITIES_PATH:
+            procedure = fields.get("ddlProcedures") or state.get("procedure")
+            if target == "dgActivities$ctl02$cmdListFiles" and procedure in PROCEDURES:
+                self._send_html(_files_page(action, f"{DOWNLOAD_PATH}?report={procedure}"))
+            else:
+                self._send_html(_activities_page(action, procedure if procedure in PROCEDURES else None))
+        elif url.path in ELABORATION_PATHS:
+            report_id = ELABORATION_PATHS[url.path]
+            date_filter = fields.get("ctl00$MainContent$txtDateFilter2$txtDate", "")
+            message = ""
+            if "ctl00$MainContent$cmdConfirm" in fields:
+                activity = self.portal.submit(report_id, fields.get("ctl00$MainContent$ddlModel", ""), date_filter)
+                query = parse_qs(url.query)
+                requests_href = f"ElabRequests.aspx?idPlant={query.get('idPlant', ['19'])[0]}&idElaborationType={report_id}"
+                message = (f"Elaboration correctly executed. Activity ID: {activity.activity_id} "
+                           f"<a class=\"actlink\" href=\"{escape(requests_href)}\">View requests</a>")
+            self._send_html(_elaboration_page(action, self.portal, report_id, date_filter, message))
+        elif url.path == REQUESTS_PATH:
+            match = re.fullmatch(r"dgElaborationRequests\$ctl(\d+)\$cmdListFiles", target)
+            rows = state.get("rows", [])
+            if match and 0 <= int(match.group(1)) - 2 < len(rows):
+                activity = self.portal.activities.get(rows[int(match.group(1)) - 2])
+                download_href = f"{DOWNLOAD_PATH}?id={activity.activity_id}" if activity and activity.is_ready() else None
+                self._send_html(_files_page(action, download_href))
+            else:
+                # Apply Filter and any other post-back: Post/Redirect/Get so browser history stays on GET pages
+                self._redirect(action)
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def _download(self, query):
+        activity = None
+        if "id" in query:
+            activity = self.portal.activities.get(query["id"][0])
+            if activity is None or not activity.is_ready():
+                return self._send(404, b"File not found", "text/plain")
+            data = self.portal.file_bytes(activity.report_id, activity.model_text)
+            filename = f"Elab{activity.report_id}_{activity.activity_id}.csv"
+        elif query.get("report", [""])[0] in PROCEDURES:
+            report_id = query["report"][0]
+            data = self.portal.file_bytes(report_id)
+            filename = f"{PROCEDURES[report_id].replace(' ', '_')}.csv"
+        else:
+            return self._send(404, b"File not found", "text/plain")
+
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Accept-Ranges": "bytes"}
+        status = 200
+        range_match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if range_match:
+            offset = int(range_match.group(1))
+            if offset >= len(data):
+                return self._send(416, b"", "text/plain", {"Content-Range": f"bytes */{len(data)}", **headers})
+            headers["Content-Range"] = f"bytes {offset}-{len(data) - 1}/{len(data)}"
+            data, status = data[offset:], 206
+        self._send(status, data, "application/octet-stream", headers)
+        if activity is not None and activity.downloaded_at is None:
+            activity.downloaded_at = time.time()
+
+
+class FakePortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, portal, host=FAKE_PORTAL_HOST, port=FAKE_PORTAL_PORT, verbose=False):
+        super().__init__((host, port), FakePortalHandler)
+        self.portal = portal
+        self.verbose = verbose
+
+    @property
+    def host(self):
+        return f"{self.server_address[0]}:{self.server_address[1]}"
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, name="FakePortal", daemon=True)
+        thread.start()
+        return thread
+
+
+def point_extract_at(host):
+    """Sends Extract's portal URLs to `host` over plain HTTP."""
+    Extract.PORTAL_SCHEME = "http"
+    Extract.BASE_URL = f"{host}/{Extract.BASE_URL.split('/', 1)[1]}"
+    for config in Extract.ELABORATION_REPORTS.values():
+        config["url"] = f"{host}/{config['url'].split('/', 1)[1]}"
+
+# ====================================================================================
+# --- END-TO-END BENCHMARK ---
+# ====================================================================================
+
+def _fake_models(count):
+    return {f"Modelo{i + 1}": f"{2800 + 10 * i} - 0 (**)" for i in range(count)}
+
+
+def run_concurrency(concurrency, args):
+    """
+    One Report 61 elaboration of every fake model through the real Extract flow
+    (Edge session pool, chunk submission, readiness polling, downloads).
+    """
+    models_data = _fake_models(args.models)
+    portal = FakePortal(models_data, latency=args.latency, jitter=args.jitter, page_delay=args.page_delay,
+                        file_rows=args.file_rows)
+    server = FakePortalServer(portal, port=0, verbose=args.verbose)
+    server.start_in_thread()
+    point_extract_at(server.host)
+    Extract.MAX_CONCURRENT_CHUNKS = concurrency
+    Extract.CHUNK_SIZE = args.chunk_size
+    Extract.DOWNLOAD_BACKEND = args.backend
+    Extract.ELABORATION_DEFAULT_SECONDS = args.latency
+
+    base_path = tempfile.mkdtemp(prefix=f"fake_portal_c{concurrency}_")
+    reports_path = os.path.join(base_path, Extract.REPORTS_FOLDER_NAME)
+    os.makedirs(reports_path)
+    with open(os.path.join(base_path, Extract.JSON_MODELS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(models_data, f, indent=4)
+    credentials = {"Usuario": FAKE_USER, "Senha": FAKE_PASSWORD}
+
+    try:
+        print(f"\n--- 🧪 Concurrency {concurrency}: {args.models} models, chunks of {args.chunk_size}, portal at {server.host} ---")
+        session_pool = Extract.EdgeSessionPool(args.driver, reports_path, credentials, size=concurrency)
+        start_time = time.time()
+        session_pool.start()
+        pool_seconds = time.time() - start_time
+        try:
+            start_time = time.time()
+            Extract.process_elaboration_report("61", session_pool, reports_path, credentials, base_path)
+            wall_seconds = time.time() - start_time
+        finally:
+            session_pool.close()
+
+        modelos_folder = os.path.join(reports_path, Extract.MODELS_SUBFOLDER_NAME_61)
+        downloaded = len(os.listdir(modelos_folder)) if os.path.isdir(modelos_folder) else 0
+        chunk_count = math.ceil(args.models / args.chunk_size)
+        # Best case: each round of parallel chunks costs exactly one elaboration latency
+        ideal_seconds = math.ceil(chunk_count / concurrency) * args.latency
+        overhead_seconds = wall_seconds - ideal_seconds
+        return {
+            "concurrency": concurrency,
+            "models_downloaded": downloaded,
+            "wall_seconds": round(wall_seconds, 1),
+            "models_per_minute": round(downloaded / (wall_seconds / 60), 2) if wall_seconds else None,
+            "pool_start_seconds": round(pool_seconds, 1),
+            "ideal_seconds": ideal_seconds,
+            "browser_overhead_seconds": round(overhead_seconds, 1),
+            "browser_overhead_per_model_seconds": round(overhead_seconds / downloaded, 2) if downloaded else None,
+            "portal": portal.stats(),
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(base_path, ignore_errors=True)
+
+
+def run_benchmark(args):
+    runs = [run_concurrency(concurrency, args) for concurrency in args.concurrency]
+    print("\n--- 📊 Elaboration throughput ---")
+    for run in runs:
+        print(f"  concurrency {run['concurrency']:>2}: {run['models_downloaded']:>3} models in {run['wall_seconds']:>7.1f}s"
+              f" = {run['models_per_minute']} models/min, browser overhead {run['browser_overhead_seconds']}s"
+              f" ({run['browser_overhead_per_model_seconds']}s/model), pool start {run['pool_start_seconds']}s")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "models": args.models,
+            "chunk_size": args.chunk_size,
+            "latency_seconds": args.latency,
+            "latency_jitter": args.jitter,
+            "page_delay_seconds": args.page_delay,
+            "file_rows": args.file_rows,
+            "download_backend": args.backend,
+        },
+        "runs": runs,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+
+def serve(args):
+    portal = FakePortal(_fake_models(args.models), latency=args.latency, jitter=args.jitter,
+                        page_delay=args.page_delay, file_rows=args.file_rows)
+    server = FakePortalServer(portal, port=args.port, verbose=args.verbose)
+    print(f"🌐 Fake RTM portal on http://{server.host}{ACTIVITIES_PATH} (user '{FAKE_USER}', password '{FAKE_PASSWORD}')")
+    print(f"   Models: {', '.join(portal.models_data.values())}")
+    print("   Set PORTAL_SCHEME = \"http\" and point BASE_URL / ELABORATION_REPORTS at this host to use it. Ctrl+C stops.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Local stand-in for the RTM portal, with an end-to-end scraping benchmark.")
+    parser.add_argument("--benchmark", action="store_true", help="Run the end-to-end benchmark instead of only serving")
+    parser.add_argument("--port", type=int, default=FAKE_PORTAL_PORT)
+    parser.add_argument("--models", type=int, default=DEFAULT_MODELS)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY_SECONDS, help="Elaboration time per model, in seconds")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_LATENCY_JITTER)
+    parser.add_argument("--page-delay", type=float, default=DEFAULT_PAGE_DELAY_SECONDS)
+    parser.add_argument("--file-rows", type=int, default=DEFAULT_FILE_ROWS, help="Rows per elaborated file")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="MAX_CONCURRENT_CHUNKS levels to benchmark")
+    parser.add_argument("--chunk-size", type=int, default=Extract.CHUNK_SIZE)
+    parser.add_argument("--backend", choices=["browser", "http"], default=Extract.DOWNLOAD_BACKEND)
+    parser.add_argument("--driver", default=os.path.join(base_path, Extract.DRIVER_FOLDER_NAME, Extract.DRIVER_NAME))
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()